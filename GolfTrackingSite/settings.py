@@ -50,6 +50,7 @@ MIDDLEWARE = [
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
+    'golfapp.routers.ReplicaMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
@@ -81,9 +82,39 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
+        'CONN_MAX_AGE': 0 if DEBUG else 600, # Keep connections, and the page cache and memory map that come with them, between requests
+        'OPTIONS': {
+            'timeout': 5, # Seconds to wait for another connection's write lock instead of failing with "database is locked"
+        },
     }
 }
 
+# Reads of GET and HEAD requests go to one of the DATABASE_REPLICAS aliases, a golfer's reads stay on the primary for
+# REPLICA_STICKY_SECONDS after they post (see golfapp/routers.py). To try it locally add a second SQLite file, kept in sync with
+# manage.py sync_replicas --interval 5:
+#   DATABASES['replica'] = dict(DATABASES['default'], NAME=os.path.join(BASE_DIR, 'db-replica.sqlite3'), TEST={'MIRROR': 'default'})
+#   DATABASE_REPLICAS = ['replica']
+DATABASE_ROUTERS = ['golfapp.routers.ReplicaRouter']
+DATABASE_REPLICAS = []
+REPLICA_STICKY_SECONDS = 10
+
+# Set on every new SQLite connection by golfapp/database.py.
+# Run the sqlite_maintenance command periodically (cron) to checkpoint the write-ahead log and refresh the query planner statistics
+SQLITE_PRAGMAS = {
+    'busy_timeout': 5000, # milliseconds
+    'mmap_size': 256 * 1024 * 1024,
+    'cache_size': -20000, # in KiB when negative, 20MB per connection
+    'temp_store': 'MEMORY',
+}
+# Production profile. journal_mode is stored in the database file itself, so WAL is left off in development where db.sqlite3 is
+# the copy tracked in git. In WAL mode pages are read while a score is being written, synchronous=NORMAL only syncs at
+# checkpoints, which WAL keeps safe from corruption
+if not DEBUG:
+    SQLITE_PRAGMAS.update({
+        'journal_mode': 'WAL',
+        'synchronous': 'NORMAL',
+    })
+
 
 # Password validation
 # https://docs.djangoproject.com/en/2.2/ref/settings/#auth-password-validators
@@ -121,13 +152,29 @@ USE_TZ = True
 # Static files (CSS, JavaScript, Images)
 # https://docs.djangoproject.com/en/2.2/howto/static-files/
 
-STATIC_ROOT = ''
+STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
 STATIC_URL = '/static/'
 STATICFILES_DIRS = ( os.path.join('static'), )
 
+# collectstatic fingerprints every file and writes gzip/brotli copies (golfapp/staticfiles.py). Only used without DEBUG,
+# since the fingerprinted names come from the manifest collectstatic writes
+if not DEBUG:
+    STATICFILES_STORAGE = 'golfapp.staticfiles.CompressedManifestStaticFilesStorage'
+
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media') 
 MEDIA_URL = '/media/'
 
+# How golfapp.media hands uploaded files to the client: 'django' streams them through the WSGI server's file wrapper,
+# 'x-accel' lets nginx send them from the internal location at MEDIA_ACCEL_PREFIX, 'x-sendfile' lets Apache or lighttpd send them
+MEDIA_DELIVERY = 'django'
+MEDIA_ACCEL_PREFIX = '/protected-media/'
+
+# The default upload handlers, also hashing each upload as it streams in so course pictures can be stored by content
+FILE_UPLOAD_HANDLERS = [
+    'golfapp.storage.HashingMemoryFileUploadHandler',
+    'golfapp.storage.HashingTemporaryFileUploadHandler',
+]
+
 # When the user login or logsout they will be redirected to the home page
 LOGIN_REDIRECT_URL = 'home'
 LOGOUT_REDIRECT_URL = 'home'
\ No newline at end of file
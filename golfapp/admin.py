@@ -1,9 +1,15 @@
-from django.contrib import admin
+import io
+
+from django.contrib import admin, messages
 from django.contrib.auth import get_user_model
 from django.contrib.auth.admin import UserAdmin
+from django.shortcuts import redirect
+from django.template.response import TemplateResponse
+from django.urls import path
 
-from .forms import GolferUserCreationForm, GolferUserChangeForm
-from .models import GolferUser, Tee, TeeColor, Course, Round, CoursePicture
+from .forms import CourseImportForm, GolferUserCreationForm, GolferUserChangeForm
+from .importer import import_courses
+from .models import GolferUser, Tee, TeeColor, Course, Round, CoursePicture, CourseRating
 
 # Register your models here.
 class GolferUserAdmin(UserAdmin):
@@ -15,6 +21,35 @@ class GolferUserAdmin(UserAdmin):
 admin.site.register(GolferUser, GolferUserAdmin)
 admin.site.register(Tee)
 admin.site.register(TeeColor)
-admin.site.register(Course)
+
+# Courses can be imported from a CSV or NDJSON upload. The upload is read as a stream from the temporary file Django saved it to
+class CourseAdmin(admin.ModelAdmin):
+    change_list_template = 'admin/golfapp/course/change_list.html'
+    max_import_errors = 20
+
+    def get_urls(self):
+        return [path('import/', self.admin_site.admin_view(self.import_view), name='golfapp_course_import')] + super().get_urls()
+
+    def import_view(self, request):
+        if not self.has_add_permission(request):
+            return redirect('admin:golfapp_course_changelist')
+        form = CourseImportForm(request.POST or None, request.FILES or None)
+        if request.method == 'POST' and form.is_valid():
+            upload = form.cleaned_data['file']
+            stream = io.TextIOWrapper(upload.file, encoding='utf-8', errors='replace', newline='')
+            result = import_courses(stream, form.cleaned_data['format'])
+            self.message_user(request, 'Courses: %d created, %d updated. Holes: %d created, %d updated. Tees: %d created, %d updated.' % (
+                result.courses_created, result.courses_updated, result.holes_created, result.holes_updated,
+                result.tees_created, result.tees_updated))
+            for line, message in result.errors[:self.max_import_errors]:
+                self.message_user(request, 'Line %d skipped: %s' % (line, message), messages.WARNING)
+            if result.error_count > self.max_import_errors:
+                self.message_user(request, '%d more rows were skipped.' % (result.error_count - self.max_import_errors), messages.WARNING)
+            return redirect('admin:golfapp_course_changelist')
+        context = dict(self.admin_site.each_context(request), form=form, opts=self.model._meta, title='Import courses')
+        return TemplateResponse(request, 'admin/golfapp/course/import_form.html', context)
+
+admin.site.register(Course, CourseAdmin)
 admin.site.register(Round)
-admin.site.register(CoursePicture)
\ No newline at end of file
+admin.site.register(CoursePicture)
+admin.site.register(CourseRating)
\ No newline at end of file
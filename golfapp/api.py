@@ -0,0 +1,158 @@
+from collections import defaultdict
+
+from django.http import JsonResponse
+from django.views.generic.base import View
+
+from .models import Course, Hole, Round, Score, Tee
+
+# Read only JSON scorecards for the mobile client and reporting jobs.
+# Holes are sent as rows of values with the column names given once per response, not as an object per hole, and ?fields= and
+# ?hole_fields= pick the values wanted. Any number of courses or rounds (up to MAX_IDS) are fetched with ?ids=1,2,3 in the same
+# few queries as one, a query per kind of row. Datetimes are ISO 8601 strings.
+#   /api/courses?ids=1,2   {"hole_fields": ["id", "number", ...], "courses": [{"id": 1, ..., "holes": [[7, 1, ...], ...]}, ...]}
+# A course hole's yards are a list matching the course's tee_colors, None where the hole has no tee of that color.
+# A round hole's yards are from the round's tee color, its strokes None until the hole has a score
+
+MAX_IDS = 100
+
+COURSE_FIELDS = ['id', 'name', 'city', 'state', 'tee_colors', 'holes']
+COURSE_HOLE_FIELDS = ['id', 'number', 'name', 'mens_par', 'womens_par', 'yards']
+ROUND_FIELDS = ['id', 'name', 'course_id', 'course', 'tee_color', 'created_on', 'completed_on',
+    'total_strokes', 'holes_played', 'to_par', 'holes']
+ROUND_HOLE_FIELDS = ['number', 'mens_par', 'womens_par', 'yards', 'strokes']
+
+
+class BadRequest(ValueError):
+    pass
+
+
+def _fields(request, name, allowed):
+    if not request.GET.get(name):
+        return allowed
+    fields = request.GET[name].split(',')
+    unknown = [field for field in fields if field not in allowed]
+    if unknown:
+        raise BadRequest('Unknown %s: %s' % (name, ', '.join(unknown)))
+    return fields
+
+
+def _ids(value):
+    try:
+        ids = list(dict.fromkeys(int(pk) for pk in value.split(',') if pk))
+    except ValueError:
+        raise BadRequest('ids must be a comma separated list of numbers')
+    if not ids or len(ids) > MAX_IDS:
+        raise BadRequest('Between 1 and %d ids can be fetched at once' % MAX_IDS)
+    return ids
+
+
+# Course rows in the order of ids, missing courses left out. 4 queries: courses, their tee colors, holes and tees
+def course_rows(ids, fields=COURSE_FIELDS, hole_fields=COURSE_HOLE_FIELDS):
+    courses = Course.objects.in_bulk(ids)
+    colors = defaultdict(list)
+    if 'tee_colors' in fields or 'holes' in fields:
+        through = Course.tee_colors.through.objects.filter(course_id__in=courses).order_by('course_id', 'teecolor_id')
+        for course_id, color in through.values_list('course_id', 'teecolor__color'):
+            colors[course_id].append(color)
+    holes = defaultdict(list)
+    if 'holes' in fields:
+        yards = {}
+        if 'yards' in hole_fields:
+            yards = {(hole_id, color): value for hole_id, color, value in
+                Tee.objects.filter(hole__course_id__in=courses).values_list('hole_id', 'color', 'yards')}
+        for hole in Hole.objects.filter(course_id__in=courses).order_by('course_id', 'number'):
+            hole.yards = [yards.get((hole.pk, color)) for color in colors[hole.course_id]]
+            holes[hole.course_id].append([getattr(hole, 'pk' if field == 'id' else field) for field in hole_fields])
+
+    rows = []
+    for pk in ids:
+        course = courses.get(pk)
+        if course is None:
+            continue
+        values = {'id': course.pk, 'name': course.name, 'city': course.city, 'state': course.state,
+            'tee_colors': colors[course.pk], 'holes': holes[course.pk]}
+        rows.append({field: values[field] for field in fields})
+    return rows
+
+
+# Round rows in the order of ids, missing rounds left out. 4 queries: rounds with their course and tee color, holes, tees and scores
+def round_rows(ids, fields=ROUND_FIELDS, hole_fields=ROUND_HOLE_FIELDS):
+    rounds = Round.objects.select_related('course', 'tee_color').in_bulk(ids)
+    holes = defaultdict(list)
+    if 'holes' in fields:
+        course_ids = {round.course_id for round in rounds.values()}
+        course_holes = defaultdict(list)
+        for hole in Hole.objects.filter(course_id__in=course_ids).order_by('course_id', 'number').values('pk', 'course_id', 'number', 'mens_par', 'womens_par'):
+            course_holes[hole['course_id']].append(hole)
+        yards = {}
+        if 'yards' in hole_fields:
+            colors = {round.tee_color.color for round in rounds.values() if round.tee_color}
+            yards = {(hole_id, color): value for hole_id, color, value in
+                Tee.objects.filter(hole__course_id__in=course_ids, color__in=colors).values_list('hole_id', 'color', 'yards')}
+        strokes = {}
+        if 'strokes' in hole_fields:
+            strokes = {(round_id, hole_id): value for round_id, hole_id, value in
+                Score.objects.filter(round_id__in=rounds, hole__isnull=False).values_list('round_id', 'hole_id', 'strokes')}
+        for round in rounds.values():
+            color = round.tee_color.color if round.tee_color else None
+            for hole in course_holes[round.course_id]:
+                values = dict(hole, yards=yards.get((hole['pk'], color)), strokes=strokes.get((round.pk, hole['pk'])))
+                holes[round.pk].append([values[field] for field in hole_fields])
+
+    rows = []
+    for pk in ids:
+        round = rounds.get(pk)
+        if round is None:
+            continue
+        values = {
+            'id': round.pk,
+            'name': round.name,
+            'course_id': round.course_id,
+            'course': round.course.name if round.course else None,
+            'tee_color': round.tee_color.color if round.tee_color else None,
+            'created_on': round.created_on,
+            'completed_on': round.completed_on,
+            'total_strokes': round.total_strokes,
+            'holes_played': round.holes_played,
+            'to_par': round.to_par,
+            'holes': holes[round.pk],
+        }
+        rows.append({field: values[field] for field in fields})
+    return rows
+
+
+# /api/<kind> with ?ids= for a batch, /api/<kind>/<pk> for one
+# name is the key the rows are sent under, rows the function building them
+class ScorecardApi(View):
+    name = None
+    fields = hole_fields = None
+    rows = None
+
+    def get(self, request, pk=None):
+        try:
+            ids = [pk] if pk is not None else _ids(request.GET.get('ids', ''))
+            fields = _fields(request, 'fields', self.fields)
+            hole_fields = _fields(request, 'hole_fields', self.hole_fields)
+        except BadRequest as error:
+            return JsonResponse({'error': str(error)}, status=400)
+        rows = self.rows(ids, fields, hole_fields)
+        if pk is not None and not rows:
+            return JsonResponse({'error': 'Not found'}, status=404)
+        data = {self.name: rows}
+        if 'holes' in fields:
+            data = {'hole_fields': hole_fields, self.name: rows}
+        return JsonResponse(data, json_dumps_params={'separators': (',', ':')})
+
+
+class CourseApi(ScorecardApi):
+    name = 'courses'
+    fields = COURSE_FIELDS
+    hole_fields = COURSE_HOLE_FIELDS
+    rows = staticmethod(course_rows)
+
+
+class RoundApi(ScorecardApi):
+    name = 'rounds'
+    fields = ROUND_FIELDS
+    hole_fields = ROUND_HOLE_FIELDS
+    rows = staticmethod(round_rows)
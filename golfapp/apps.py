@@ -3,3 +3,7 @@ from django.apps import AppConfig
 
 class GolfappConfig(AppConfig):
     name = 'golfapp'
+
+    # Connect the signal handlers that keep the stored round totals up to date, and the one setting up SQLite connections
+    def ready(self):
+        from . import database, signals
@@ -0,0 +1,30 @@
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+# Pragmas from settings.SQLITE_PRAGMAS are set on each SQLite connection as it is opened. With CONN_MAX_AGE a connection serves many
+# requests, so this runs once per connection rather than once per request.
+# checkpoint and optimize are run by the sqlite_maintenance command.
+
+
+@receiver(connection_created)
+def configure_sqlite(sender, connection, **kwargs):
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        for name, value in getattr(settings, 'SQLITE_PRAGMAS', {}).items():
+            cursor.execute('PRAGMA %s = %s' % (name, value))
+
+
+# Copies everything in the write-ahead log into the database file and truncates the log, returns (busy, log pages, checkpointed pages).
+# busy is 1 when a reader or writer kept the checkpoint from finishing, the rest is copied next time
+def checkpoint(connection, mode='TRUNCATE'):
+    with connection.cursor() as cursor:
+        cursor.execute('PRAGMA wal_checkpoint(%s)' % mode)
+        return cursor.fetchone()
+
+
+# Lets SQLite run ANALYZE on the tables whose statistics are out of date, so the query planner keeps picking the right indexes
+def optimize(connection):
+    with connection.cursor() as cursor:
+        cursor.execute('PRAGMA optimize')
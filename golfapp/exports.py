@@ -0,0 +1,56 @@
+import csv
+from itertools import groupby
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import OuterRef, Subquery
+
+from .models import Tee
+
+# Exports of rounds as CSV or NDJSON, a row per hole played (or one row with no hole for a round without scores).
+# The query reads a round's scores in the order of the (round, hole) index and each round's few rows are put in hole number order
+# here, sparing the database a sort of the whole export.
+# The rows come from one query over the rounds joined to their course, tee color, scores and holes, read with a server side cursor
+# chunk_size rows at a time and written out as they are read, so memory stays flat however many rounds a golfer has.
+
+COLUMNS = ['round_id', 'round_name', 'golfer', 'created_on', 'completed_on', 'course', 'city', 'state', 'tee_color',
+    'total_strokes', 'to_par', 'hole_number', 'hole_name', 'mens_par', 'womens_par', 'yards', 'strokes']
+HOLE_NUMBER = COLUMNS.index('hole_number')
+
+
+# rounds is a queryset of the rounds to export
+def export_rows(rounds, chunk_size=2000):
+    yards = Tee.objects.filter(hole_id=OuterRef('score__hole_id'), color=OuterRef('tee_color__color')).values('yards')[:1]
+    rows = (rounds
+        .annotate(yards=Subquery(yards))
+        .order_by('created_by_id', '-created_on', '-id', 'score__hole_id')
+        .values_list('pk', 'name', 'created_by__username', 'created_on', 'completed_on', 'course__name', 'course__city', 'course__state',
+            'tee_color__color', 'total_strokes', 'to_par', 'score__hole__number', 'score__hole__name', 'score__hole__mens_par',
+            'score__hole__womens_par', 'yards', 'score__strokes'))
+    for round_id, holes in groupby(rows.iterator(chunk_size=chunk_size), key=lambda row: row[0]):
+        yield from sorted(holes, key=lambda row: row[HOLE_NUMBER] or 0)
+
+
+# csv.writer writes each row to this and gets the line back
+class _Line:
+    def write(self, value):
+        return value
+
+
+def csv_lines(rows):
+    writer = csv.writer(_Line())
+    yield writer.writerow(COLUMNS)
+    for row in rows:
+        yield writer.writerow(row)
+
+
+def ndjson_lines(rows):
+    encoder = DjangoJSONEncoder(separators=(',', ':'))
+    for row in rows:
+        yield encoder.encode(dict(zip(COLUMNS, row))) + '\n'
+
+
+# format -> (function writing the lines, content type, file extension)
+FORMATS = {
+    'csv': (csv_lines, 'text/csv', 'csv'),
+    'ndjson': (ndjson_lines, 'application/x-ndjson', 'ndjson'),
+}
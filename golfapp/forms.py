@@ -2,8 +2,12 @@ from django import forms
 from django.forms import ModelForm
 from django.contrib.auth.forms import UserCreationForm, UserChangeForm
 from django.core.exceptions import NON_FIELD_ERRORS # Allow the use of a custom error message 
+from django.core.exceptions import ValidationError
 
-from .models import GolferUser, Hole, Tee, Course, TeeColor, Score, CoursePicture
+from django.urls import reverse
+
+from .models import GolferUser, Hole, Tee, Course, TeeColor, Score, CoursePicture, Round
+from .search import search_courses
 
 class GolferUserCreationForm(UserCreationForm):
     class Meta:
@@ -72,6 +76,160 @@ class ScoreForm(ModelForm):
             }
         }
 
+# The course is picked with a typeahead over the course search instead of a select list of every course,
+# so the form stays the same size however many courses there are. Tee colors are limited to the chosen course's colors
+class RoundForm(ModelForm):
+    course_search = forms.CharField(label='Course', required=False, max_length=255)
+    field_order = ['name', 'course_search', 'course', 'tee_color']
+
+    class Meta:
+        model = Round
+        fields = ('name', 'course', 'tee_color')
+        widgets = {
+        # Course is set by the typeahead
+            'course': forms.HiddenInput,
+        }
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.fields['course'].required = False
+        self.fields['course_search'].widget.attrs.update({
+            'class': 'course-autocomplete',
+            'autocomplete': 'off',
+            'data-url': reverse('course_autocomplete'),
+            'data-course': self.add_prefix('course'),
+            'data-tee-color': self.add_prefix('tee_color'),
+        })
+        self.selected_course = self._selected_course()
+        if self.selected_course and not self.is_bound:
+            self.initial['course_search'] = self.selected_course.name
+        self.fields['tee_color'].queryset = TeeColor.objects.filter(courses=self.selected_course) if self.selected_course else TeeColor.objects.none()
+
+    # The course picked in the typeahead, or without javascript the single course matching the typed name
+    def _selected_course(self):
+        if self.is_bound:
+            course_id = self.data.get(self.add_prefix('course'))
+        else:
+            course_id = self.initial.get('course') or self.instance.course_id
+        if course_id:
+            try:
+                return Course.objects.filter(pk=int(course_id)).first()
+            except (TypeError, ValueError):
+                return None
+        if self.is_bound:
+            name = self.data.get(self.add_prefix('course_search'), '')
+            matches = search_courses(name, limit=2)
+            exact = [course for course in matches if course.name.lower() == name.strip().lower()]
+            if len(matches) == 1 or len(exact) == 1:
+                return exact[0] if exact else matches[0]
+        return None
+
+    def clean_course(self):
+        if self.selected_course is None:
+            raise ValidationError('Choose a course from the list.')
+        return self.selected_course
+
+# One hole of the whole card score entry. The hole is set by the view, leaving strokes blank leaves the hole without a score
+class ScoreEntryForm(forms.Form):
+    hole = forms.IntegerField(widget=forms.HiddenInput)
+    strokes = forms.IntegerField(required=False, min_value=1, max_value=100)
+
+# The score entry formset has one form per hole of the round's course
+class BaseScoreEntryFormSet(forms.BaseFormSet):
+    def __init__(self, *args, hole_ids=(), **kwargs):
+        self.hole_ids = set(hole_ids)
+        self.max_num = len(self.hole_ids) # Keeps the formset script from offering extra holes
+        super().__init__(*args, **kwargs)
+
+    # Each hole can only be scored once per round and must belong to the round's course
+    def clean(self):
+        super().clean()
+        seen = set()
+        for form in self.forms:
+            hole_id = form.cleaned_data.get('hole') if hasattr(form, 'cleaned_data') else None
+            if hole_id is None:
+                continue
+            if hole_id not in self.hole_ids:
+                raise ValidationError('A score was entered for a hole that is not on this course.')
+            if hole_id in seen:
+                raise ValidationError('Each hole can only have one score per round.')
+            seen.add(hole_id)
+
+ScoreEntryFormSet = forms.formset_factory(ScoreEntryForm, formset=BaseScoreEntryFormSet, extra=0, can_delete=True)
+
+# One hole of the course layout editor with a yards field for each of the course's tee colors.
+# hole_id is blank for holes that are being added
+class HoleLayoutForm(forms.Form):
+    hole_id = forms.IntegerField(required=False, widget=forms.HiddenInput)
+    number = forms.IntegerField(min_value=1)
+    name = forms.CharField(max_length=255, required=False)
+    mens_par = forms.IntegerField(min_value=1, max_value=10)
+    womens_par = forms.IntegerField(min_value=1, max_value=10)
+
+    def __init__(self, *args, colors=(), **kwargs):
+        super().__init__(*args, **kwargs)
+        self.colors = colors
+        for color in colors:
+            self.fields['yards_' + color] = forms.IntegerField(required=False, min_value=1, max_value=1000, label=color.title() + ' yards')
+
+    def clean_name(self):
+        return self.cleaned_data['name'] or None
+
+    # The yards fields paired with their color, used by the template
+    def yards_fields(self):
+        return [(color, self['yards_' + color]) for color in self.colors]
+
+# The layout formset holds the whole hole x tee color grid of a course.
+# Conflicts with the Hole and Tee unique_together constraints are found here instead of when the rows are written
+class BaseHoleLayoutFormSet(forms.BaseFormSet):
+    def __init__(self, *args, holes=(), **kwargs):
+        self.holes = {hole.pk: hole for hole in holes}
+        super().__init__(*args, **kwargs)
+
+    # Forms that will be written. Deleted forms and untouched blank rows are left out
+    def layout_forms(self):
+        return [form for form in self.forms
+            if not self._should_delete_form(form) and (form.cleaned_data.get('hole_id') or form.has_changed())]
+
+    # Existing holes that were removed from the grid
+    def deleted_hole_ids(self):
+        return {form.cleaned_data.get('hole_id') for form in self.forms
+            if self._should_delete_form(form) and form.cleaned_data.get('hole_id')}
+
+    def clean(self):
+        super().clean()
+        if any(self.errors):
+            return
+        kept = {}
+        for form in self.layout_forms():
+            hole_id = form.cleaned_data.get('hole_id')
+            if hole_id and hole_id not in self.holes:
+                raise ValidationError('A hole in the layout does not belong to this course.')
+            if hole_id:
+                kept[hole_id] = form
+        # Holes missing from the submitted grid keep their number and name, so the grid can't reuse them
+        numbers, names = set(), set()
+        deleted = self.deleted_hole_ids()
+        for hole in self.holes.values():
+            if hole.pk not in kept and hole.pk not in deleted:
+                numbers.add(hole.number)
+                if hole.name:
+                    names.add(hole.name)
+        errors = []
+        for form in self.layout_forms():
+            number, name = form.cleaned_data['number'], form.cleaned_data['name']
+            if number in numbers:
+                errors.append('Hole %d is on this course more than once.' % number)
+            numbers.add(number)
+            if name:
+                if name in names:
+                    errors.append('The name "%s" is used by more than one hole.' % name)
+                names.add(name)
+        if errors:
+            raise ValidationError(errors)
+
+HoleLayoutFormSet = forms.formset_factory(HoleLayoutForm, formset=BaseHoleLayoutFormSet, extra=1, can_delete=True)
+
 class CoursePictureForm(ModelForm):
     class Meta:
         model = CoursePicture
@@ -79,4 +237,18 @@ class CoursePictureForm(ModelForm):
         # Course is set automaticaly 
         widgets = {
             'course': forms.HiddenInput,
-        }
\ No newline at end of file
+        }
+# Admin upload of a course file for importer.py. The format is taken from the file name unless it is picked
+class CourseImportForm(forms.Form):
+    file = forms.FileField()
+    format = forms.ChoiceField(choices=[('', 'From the file name'), ('csv', 'CSV'), ('ndjson', 'NDJSON')], required=False)
+
+    def clean(self):
+        cleaned_data = super().clean()
+        upload = cleaned_data.get('file')
+        if upload and not cleaned_data.get('format'):
+            format = upload.name.rsplit('.', 1)[-1].lower()
+            if format not in ('csv', 'ndjson'):
+                raise ValidationError('Pick the format of %s, it could not be told from the file name.' % upload.name)
+            cleaned_data['format'] = format
+        return cleaned_data
@@ -0,0 +1,183 @@
+from collections import defaultdict
+from decimal import Decimal, ROUND_HALF_UP
+
+from django.db import transaction
+from django.db.models import OuterRef, Subquery
+
+from .models import CourseRating, HandicapIndex, Round, Score, ScoreDifferential
+
+# World Handicap System style handicap index.
+# A score differential is worked out once when a round on rated tees is completed: (113 / slope) x (adjusted gross score - course rating).
+# The index is the average of the best 8 of the golfer's 20 most recent differentials, kept in a window on HandicapIndex
+# so a new round only has to be slotted into at most 20 entries.
+# The holes have no stroke index, so handicap strokes are given out in hole number order when capping the adjusted gross score.
+
+WINDOW = 20
+MAX_INDEX = Decimal('54.0')
+
+# Number of differentials -> (how many of the lowest are averaged, adjustment)
+DIFFERENTIALS_USED = {
+    3: (1, Decimal('-2.0')), 4: (1, Decimal('-1.0')), 5: (1, Decimal('0')), 6: (2, Decimal('-1.0')),
+    7: (2, Decimal('0')), 8: (2, Decimal('0')), 9: (3, Decimal('0')), 10: (3, Decimal('0')), 11: (3, Decimal('0')),
+    12: (4, Decimal('0')), 13: (4, Decimal('0')), 14: (4, Decimal('0')), 15: (5, Decimal('0')), 16: (5, Decimal('0')),
+    17: (6, Decimal('0')), 18: (6, Decimal('0')), 19: (7, Decimal('0')), 20: (8, Decimal('0')),
+}
+
+
+def _tenths(value):
+    return Decimal(value).quantize(Decimal('0.1'), rounding=ROUND_HALF_UP)
+
+
+# Returns None until the golfer has 3 differentials
+def handicap_index(differentials):
+    differentials = sorted(differentials)[:WINDOW]
+    if len(differentials) not in DIFFERENTIALS_USED:
+        return None
+    used, adjustment = DIFFERENTIALS_USED[len(differentials)]
+    lowest = differentials[:used]
+    return min(_tenths(sum(lowest) / used + adjustment), MAX_INDEX)
+
+
+def course_handicap(index, rating, par):
+    return int((index * rating.slope_rating / 113 + (rating.course_rating - par)).quantize(Decimal('1'), rounding=ROUND_HALF_UP))
+
+
+# holes is a list of (number, par, strokes). Each hole is capped at net double bogey, or par + 5 before the golfer has an index
+def adjusted_gross_score(holes, index, rating):
+    holes = sorted(holes)
+    if index is None:
+        return sum(min(strokes, par + 5) for number, par, strokes in holes)
+    handicap = course_handicap(index, rating, sum(par for number, par, strokes in holes))
+    total = 0
+    for position, (number, par, strokes) in enumerate(holes):
+        received = handicap // len(holes) + (1 if position < handicap % len(holes) else 0)
+        total += min(strokes, par + 2 + received)
+    return total
+
+
+def score_differential(adjusted_gross, rating):
+    return _tenths(Decimal(113) / rating.slope_rating * (adjusted_gross - rating.course_rating))
+
+
+# Each round's holes as (number, par, strokes) using the par for the golfer's gender
+def _round_holes(round_ids):
+    holes = defaultdict(list)
+    scores = (Score.objects.filter(round_id__in=round_ids, hole__isnull=False)
+        .values_list('round_id', 'hole__number', 'hole__mens_par', 'hole__womens_par', 'strokes', 'round__created_by__gender'))
+    for round_id, number, mens_par, womens_par, strokes, gender in scores:
+        holes[round_id].append((number, mens_par if gender == 'MALE' else womens_par, strokes))
+    return holes
+
+
+def _window_entry(differential):
+    return [differential.round_id, differential.played_on.isoformat(), str(differential.differential)]
+
+
+def _sort_window(recent):
+    recent.sort(key=lambda entry: (entry[1], entry[0]), reverse=True)
+    return recent[:WINDOW]
+
+
+# The round summary fields a differential depends on
+def _key(summary):
+    if not summary:
+        return None
+    return (summary['completed_on'] is not None, summary['total_strokes'], summary['course_id'], summary['tee_color_id'],
+        summary['created_by_id'], summary['created_on'])
+
+
+# Called with the round summaries from round_totals_changed
+def record_round_change(previous, current):
+    # Only completed rounds have a differential, scores typed into a round in progress change nothing here
+    if not (previous and previous['completed_on']) and not (current and current['completed_on']):
+        return
+    if _key(previous) == _key(current):
+        return
+    round_id = (current or previous)['pk']
+    golfers = {summary['created_by_id'] for summary in (previous, current) if summary and summary['created_by_id']}
+    with transaction.atomic():
+        ScoreDifferential.objects.filter(round_id=round_id).delete()
+        differential = None
+        if current and current['completed_on'] and current['created_by_id']:
+            differential = _create_differential(current)
+        for golfer_id in golfers:
+            _update_window(golfer_id, round_id, differential if differential and differential.golfer_id == golfer_id else None)
+
+
+def _create_differential(summary):
+    rating = CourseRating.objects.filter(course_id=summary['course_id'], tee_color_id=summary['tee_color_id']).first()
+    if rating is None:
+        return None
+    handicap = HandicapIndex.objects.filter(golfer_id=summary['created_by_id']).first()
+    holes = _round_holes([summary['pk']])[summary['pk']]
+    if not holes:
+        return None
+    adjusted = adjusted_gross_score(holes, handicap.index if handicap else None, rating)
+    return ScoreDifferential.objects.create(golfer_id=summary['created_by_id'], round_id=summary['pk'], played_on=summary['created_on'],
+        adjusted_gross_score=adjusted, differential=score_differential(adjusted, rating))
+
+
+# Slots a new differential into the golfer's window, or takes the round out of it.
+# A round leaving a full window makes room for an older one, so then the window is read again from the 20 most recent differentials
+def _update_window(golfer_id, round_id, differential):
+    handicap, created = HandicapIndex.objects.select_for_update().get_or_create(golfer_id=golfer_id)
+    previous = handicap.get_recent()
+    recent = [entry for entry in previous if entry[0] != round_id]
+    if len(recent) < len(previous) and len(previous) == WINDOW:
+        recent = [_window_entry(row) for row in ScoreDifferential.objects.filter(golfer_id=golfer_id).order_by('-played_on', '-id')[:WINDOW]]
+    elif differential:
+        recent = _sort_window(recent + [_window_entry(differential)])
+    if recent == previous and not created:
+        return
+    handicap.set_recent(recent)
+    handicap.index = handicap_index([Decimal(entry[2]) for entry in recent])
+    handicap.save()
+
+
+# Works out the differentials of every completed round on rated tees, replaying each golfer's rounds in the order they were played
+# so every adjusted gross score is capped with the index the golfer had at the time
+def backfill_handicaps(batch_size=500):
+    rating = CourseRating.objects.filter(course_id=OuterRef('course_id'), tee_color_id=OuterRef('tee_color_id'))
+    rounds = (Round.objects.filter(completed_on__isnull=False, created_by__isnull=False)
+        .annotate(course_rating=Subquery(rating.values('course_rating')[:1]), slope_rating=Subquery(rating.values('slope_rating')[:1]))
+        .filter(slope_rating__isnull=False)
+        .order_by('created_by_id', 'created_on', 'pk')
+        .values_list('pk', 'created_by_id', 'created_on', 'course_rating', 'slope_rating'))
+
+    with transaction.atomic():
+        ScoreDifferential.objects.all().delete()
+        HandicapIndex.objects.all().delete()
+        windows = {}
+        batch = []
+        for row in rounds.iterator(chunk_size=batch_size):
+            batch.append(row)
+            if len(batch) == batch_size:
+                _backfill_batch(batch, windows)
+                batch = []
+        _backfill_batch(batch, windows)
+        indexes = []
+        for golfer_id, recent in windows.items():
+            handicap = HandicapIndex(golfer_id=golfer_id, index=handicap_index([Decimal(entry[2]) for entry in recent]))
+            handicap.set_recent(recent)
+            indexes.append(handicap)
+        HandicapIndex.objects.bulk_create(indexes, batch_size=batch_size)
+    return len(windows)
+
+
+def _backfill_batch(batch, windows):
+    if not batch:
+        return
+    holes = _round_holes([row[0] for row in batch])
+    differentials = []
+    for round_id, golfer_id, played_on, course_rating, slope_rating in batch:
+        if not holes.get(round_id):
+            continue
+        rating = CourseRating(course_rating=Decimal(course_rating), slope_rating=slope_rating)
+        recent = windows.setdefault(golfer_id, [])
+        index = handicap_index([Decimal(entry[2]) for entry in recent])
+        adjusted = adjusted_gross_score(holes[round_id], index, rating)
+        differential = ScoreDifferential(golfer_id=golfer_id, round_id=round_id, played_on=played_on,
+            adjusted_gross_score=adjusted, differential=score_differential(adjusted, rating))
+        differentials.append(differential)
+        windows[golfer_id] = _sort_window(recent + [_window_entry(differential)])
+    ScoreDifferential.objects.bulk_create(differentials)
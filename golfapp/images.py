@@ -0,0 +1,95 @@
+import json
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from django.core.files.base import ContentFile
+from django.db import connections, transaction
+from PIL import Image, ImageOps
+
+from .models import CoursePicture
+
+# Course pictures are resized into a thumbnail for the course page and a medium size for the picture page,
+# each saved as WebP and as progressive JPEG for browsers without WebP. Pillow only writes EXIF data when it is asked to,
+# so the variants carry no camera or location data. Orientation from EXIF is applied to the pixels first.
+# Uploads are processed by a small thread pool after the upload's transaction commits, so the request doesn't wait on Pillow.
+# Variants are named after the stored original, so pictures sharing an original (see storage.py) share its variants too.
+
+logger = logging.getLogger(__name__)
+
+# (size name, longest side in pixels). Pictures smaller than a size are not scaled up
+VARIANTS = [('thumbnail', 480), ('medium', 1280)]
+
+# (key in CoursePicture.variants, Pillow format, file extension, save options)
+FORMATS = [
+    ('webp', 'WEBP', 'webp', {'quality': 80, 'method': 6}),
+    ('jpeg', 'JPEG', 'jpg', {'quality': 82, 'optimize': True, 'progressive': True}),
+]
+
+VARIANT_DIR = 'uploads/course/variants/'
+
+_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='picture-variants')
+
+
+# Queues the picture for processing once the current transaction commits
+def schedule_variants(picture_id):
+    transaction.on_commit(lambda: _executor.submit(_make_variants_in_background, picture_id))
+
+
+def _make_variants_in_background(picture_id):
+    try:
+        picture = CoursePicture.objects.filter(pk=picture_id).first()
+        if picture is not None:
+            make_variants(picture)
+    except Exception:
+        logger.exception('Could not make variants of course picture %s', picture_id)
+    finally:
+        # The worker thread has its own database connection
+        connections.close_all()
+
+
+# The folder holding the variants of a stored original: uploads/course/ab/ab12...ef.jpg -> uploads/course/variants/ab12...ef/
+def variant_dir(name):
+    return VARIANT_DIR + os.path.splitext(os.path.basename(name))[0] + '/'
+
+
+# Writes every variant of the picture to its storage and records them on the picture.
+# A picture whose original is shared with another picture copies that picture's variants unless remake is set
+def make_variants(picture, remake=False):
+    storage = picture.picture.storage
+    if not remake:
+        shared = CoursePicture.objects.filter(picture=picture.picture.name).exclude(variants='{}').exclude(pk=picture.pk).first()
+        if shared is not None:
+            CoursePicture.objects.filter(pk=picture.pk).update(variants=shared.variants)
+            picture.variants = shared.variants
+            return picture.get_variants()
+    with picture.picture.open('rb') as original:
+        image = Image.open(original)
+        image = ImageOps.exif_transpose(image)
+        image.load()
+    if image.mode != 'RGB':
+        image = image.convert('RGB')
+
+    variants = {}
+    for size, longest_side in VARIANTS:
+        resized = image.copy()
+        resized.thumbnail((longest_side, longest_side), Image.LANCZOS)
+        variant = {'width': resized.width, 'height': resized.height}
+        for key, format, extension, options in FORMATS:
+            name = '%s%s.%s' % (variant_dir(picture.picture.name), size, extension)
+            buffer = BytesIO()
+            resized.save(buffer, format, **options)
+            variant[key] = storage.save_named(name, ContentFile(buffer.getvalue()))
+        variants[size] = variant
+
+    picture.variants = json.dumps(variants)
+    CoursePicture.objects.filter(pk=picture.pk).update(variants=picture.variants)
+    return variants
+
+
+# Deletes the variants made from a stored original
+def delete_variants(storage, name):
+    for size, longest_side in VARIANTS:
+        for key, format, extension, options in FORMATS:
+            storage.delete('%s%s.%s' % (variant_dir(name), size, extension))
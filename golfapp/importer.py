@@ -0,0 +1,253 @@
+import csv
+import json
+from itertools import groupby, islice
+
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from .models import COLOR_CHOICES, Course, Hole, Round, Score, Tee, TeeColor
+from .scorecards import expire_course_scorecards
+from .statistics import rebuild_hole_stats
+from .totals import rebuild_round_totals
+
+# Loads courses with their holes and tees from CSV or NDJSON, reading the file as a stream so memory stays flat however many courses it holds.
+# Courses are written chunk_size at a time, each chunk in one transaction with a handful of bulk queries.
+# Importing is an upsert: courses are matched on (name, city, state), holes on their course and number and tees on their hole and color,
+# so importing the same file again changes nothing. Holes and tees missing from the file are left alone.
+#
+# CSV has a row per hole, rows of the same course next to each other, with a yards_<COLOR> column for each tee color:
+#   name,city,state,number,hole_name,mens_par,womens_par,yards_WHITE,yards_BLUE
+# NDJSON has a course per line:
+#   {"name": ..., "city": ..., "state": ..., "holes": [{"number": 1, "name": null, "mens_par": 4, "womens_par": 5, "yards": {"WHITE": 350}}]}
+# A row with a problem is reported with its line number and skipped, the rest of the file is still imported.
+
+COLORS = [color for color, label in COLOR_CHOICES]
+MAX_ERRORS = 1000
+
+
+class ImportResult:
+    def __init__(self):
+        self.courses_created = self.courses_updated = 0
+        self.holes_created = self.holes_updated = 0
+        self.tees_created = self.tees_updated = 0
+        self.error_count = 0
+        self.errors = [] # (line, message), the first MAX_ERRORS of them
+
+    def error(self, line, message):
+        self.error_count += 1
+        if len(self.errors) < MAX_ERRORS:
+            self.errors.append((line, message))
+
+
+class RowError(ValueError):
+    pass
+
+
+def _number(value, name, low, high, required=True):
+    if value in (None, ''):
+        if required:
+            raise RowError('%s is missing' % name)
+        return None
+    try:
+        number = int(value)
+    except (TypeError, ValueError):
+        raise RowError('%s must be a whole number' % name)
+    if not low <= number <= high:
+        raise RowError('%s must be between %d and %d' % (name, low, high))
+    return number
+
+
+def _text(value, name, required=True):
+    value = (str(value) if value is not None else '').strip()
+    if required and not value:
+        raise RowError('%s is missing' % name)
+    if len(value) > 255:
+        raise RowError('%s is longer than 255 characters' % name)
+    return value or None
+
+
+def _hole(number, name, mens_par, womens_par, yards):
+    hole = {
+        'number': _number(number, 'number', 1, 1000),
+        'name': _text(name, 'hole name', required=False),
+        'mens_par': _number(mens_par, 'mens_par', 1, 10),
+        'womens_par': _number(womens_par, 'womens_par', 1, 10),
+        'yards': {},
+    }
+    for color, value in yards.items():
+        if color not in COLORS:
+            raise RowError('Unknown tee color %s' % color)
+        value = _number(value, 'yards_' + color, 1, 1000, required=False)
+        if value is not None:
+            hole['yards'][color] = value
+    return hole
+
+
+# Courses are dicts of name, city, state, holes (by number) and the line they start on
+def _course(line, name, city, state):
+    return {'line': line, 'name': _text(name, 'name'), 'city': _text(city, 'city'), 'state': _text(state, 'state'), 'holes': {}}
+
+
+def parse_csv(stream, result):
+    reader = csv.DictReader(stream)
+    rows = ((reader.line_num, row) for row in reader)
+    key = lambda numbered: tuple((numbered[1].get(field) or '').strip() for field in ('name', 'city', 'state'))
+    for course_key, rows in groupby(rows, key=key):
+        course = None
+        for line, row in rows:
+            try:
+                if course is None:
+                    course = _course(line, *course_key)
+                yards = {field[len('yards_'):].upper(): value for field, value in row.items() if field and field.startswith('yards_')}
+                hole = _hole(row.get('number'), row.get('hole_name'), row.get('mens_par'), row.get('womens_par'), yards)
+                course['holes'][hole['number']] = hole
+            except RowError as error:
+                result.error(line, str(error))
+        if course is not None:
+            yield course
+
+
+def parse_ndjson(stream, result):
+    for line, text in enumerate(stream, 1):
+        if not text.strip():
+            continue
+        try:
+            data = json.loads(text)
+            if not isinstance(data, dict):
+                raise RowError('Each line must be a JSON object')
+            course = _course(line, data.get('name'), data.get('city'), data.get('state'))
+            for hole in data.get('holes') or []:
+                if not isinstance(hole, dict):
+                    raise RowError('Each hole must be a JSON object')
+                hole = _hole(hole.get('number'), hole.get('name'), hole.get('mens_par'), hole.get('womens_par'), hole.get('yards') or {})
+                course['holes'][hole['number']] = hole
+        except ValueError as error: # RowError and bad JSON
+            result.error(line, str(error))
+            continue
+        yield course
+
+
+PARSERS = {'csv': parse_csv, 'ndjson': parse_ndjson}
+
+
+# Imports the courses in stream (an open text file) and returns an ImportResult
+def import_courses(stream, format, chunk_size=500):
+    result = ImportResult()
+    colors = {}
+    courses = PARSERS[format](stream, result)
+    while True:
+        chunk = list(islice(courses, chunk_size))
+        if not chunk:
+            return result
+        # A course seen twice in a chunk is imported once, the later holes winning
+        merged = {}
+        for course in chunk:
+            key = (course['name'], course['city'], course['state'])
+            if key in merged:
+                merged[key]['holes'].update(course['holes'])
+            else:
+                merged[key] = course
+        if not colors:
+            colors.update(_tee_colors())
+        try:
+            with transaction.atomic():
+                _write_courses(list(merged.values()), colors, result)
+        except IntegrityError:
+            # Something in the chunk clashes with the database (two holes of a course with the same name),
+            # write its courses one at a time to find which
+            for course in merged.values():
+                try:
+                    with transaction.atomic():
+                        _write_courses([course], colors, result)
+                except IntegrityError as error:
+                    result.error(course['line'], 'Could not save %s: %s' % (course['name'], error))
+
+
+# Every tee color by name, read once per import. Colors no course has used yet are created here
+def _tee_colors():
+    colors = {}
+    for color in TeeColor.objects.order_by('-pk'):
+        colors[color.color] = color.pk # the oldest row wins when a color is there twice
+    missing = [TeeColor(color=color) for color in COLORS if color not in colors]
+    if missing:
+        TeeColor.objects.bulk_create(missing)
+        colors.update(TeeColor.objects.filter(color__in=[color.color for color in missing]).values_list('color', 'pk'))
+    return colors
+
+
+def _write_courses(courses, colors, result):
+    existing = {}
+    for pk, name, city, state in (Course.objects.filter(name__in={course['name'] for course in courses})
+            .order_by('-pk').values_list('pk', 'name', 'city', 'state')):
+        existing[(name, city, state)] = pk
+    new = [course for course in courses if (course['name'], course['city'], course['state']) not in existing]
+    Course.objects.bulk_create([Course(name=course['name'], city=course['city'], state=course['state']) for course in new])
+    if new:
+        # SQLite doesn't return the primary keys from bulk_create so the new courses are read back by name
+        for pk, name, city, state in (Course.objects.filter(name__in={course['name'] for course in new})
+                .exclude(pk__in=existing.values()).values_list('pk', 'name', 'city', 'state')):
+            existing.setdefault((name, city, state), pk)
+    for course in courses:
+        course['pk'] = existing[(course['name'], course['city'], course['state'])]
+    course_ids = [course['pk'] for course in courses]
+
+    through = Course.tee_colors.through
+    used = {(course['pk'], colors[color]) for course in courses for hole in course['holes'].values() for color in hole['yards']}
+    used -= set(through.objects.filter(course_id__in=course_ids).values_list('course_id', 'teecolor_id'))
+    through.objects.bulk_create([through(course_id=course_id, teecolor_id=color_id) for course_id, color_id in used], ignore_conflicts=True)
+
+    now = timezone.now() # bulk_update leaves auto_now fields alone
+    holes = {(hole.course_id, hole.number): hole for hole in Hole.objects.filter(course_id__in=course_ids)}
+    created, changed, par_changed = [], [], []
+    for course in courses:
+        for number, data in course['holes'].items():
+            hole = holes.get((course['pk'], number))
+            if hole is None:
+                hole = Hole(course_id=course['pk'], number=number, name=data['name'], mens_par=data['mens_par'], womens_par=data['womens_par'])
+                created.append(hole)
+                continue
+            if (hole.mens_par, hole.womens_par) != (data['mens_par'], data['womens_par']):
+                par_changed.append(hole.pk)
+            if (hole.name, hole.mens_par, hole.womens_par) != (data['name'], data['mens_par'], data['womens_par']):
+                hole.name, hole.mens_par, hole.womens_par, hole.updated_at = data['name'], data['mens_par'], data['womens_par'], now
+                changed.append(hole)
+    Hole.objects.bulk_update(changed, ['name', 'mens_par', 'womens_par', 'updated_at'])
+    Hole.objects.bulk_create(created)
+    if created:
+        for hole in Hole.objects.filter(course_id__in={hole.course_id for hole in created}):
+            holes[(hole.course_id, hole.number)] = hole
+
+    tees = {(tee.hole_id, tee.color): tee for tee in Tee.objects.filter(hole__course_id__in=course_ids)}
+    new_tees, changed_tees = [], []
+    for course in courses:
+        for number, data in course['holes'].items():
+            hole = holes[(course['pk'], number)]
+            for color, yards in data['yards'].items():
+                tee = tees.get((hole.pk, color))
+                if tee is None:
+                    new_tees.append(Tee(hole_id=hole.pk, color=color, yards=yards))
+                elif tee.yards != yards:
+                    tee.yards, tee.updated_at = yards, now
+                    changed_tees.append(tee)
+    Tee.objects.bulk_update(changed_tees, ['yards', 'updated_at'])
+    Tee.objects.bulk_create(new_tees)
+
+    # Bulk writes don't send signals. A new hole can reopen a completed round and a new par changes the rounds played on the hole
+    hole_courses = {hole.pk: hole.course_id for hole in holes.values()}
+    touched = ({course_id for course_id, color_id in used} | {hole.course_id for hole in changed + created}
+        | {hole_courses[tee.hole_id] for tee in new_tees + changed_tees})
+    if touched:
+        expire_course_scorecards(touched)
+    rounds = set(Round.objects.filter(course_id__in={hole.course_id for hole in created}).values_list('pk', flat=True))
+    if par_changed:
+        rounds.update(Score.objects.filter(hole_id__in=par_changed).values_list('round_id', flat=True))
+        rebuild_hole_stats(par_changed)
+    if rounds:
+        rebuild_round_totals(rounds)
+
+    result.courses_created += len(new)
+    result.courses_updated += len(touched - {course['pk'] for course in new})
+    result.holes_created += len(created)
+    result.holes_updated += len(changed)
+    result.tees_created += len(new_tees)
+    result.tees_updated += len(changed_tees)
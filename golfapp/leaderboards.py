@@ -0,0 +1,153 @@
+from collections import defaultdict
+from datetime import timedelta
+
+from django.db import transaction
+from django.utils import timezone
+
+from .models import LeaderboardEntry, Round
+
+# Course leaderboards of the best completed rounds, over all tees and for each tee color, all time and over the last 30 days.
+# Each board keeps only its TOP_N best rounds. record_round_change slots a round in when its totals change and takes it out
+# when it changes again or is deleted, refilling the board from the course's rounds only when a round leaves a full board.
+# Rounds age out of the 30 day boards when prune_leaderboards runs, reading a board also skips rounds that are past its window.
+
+TOP_N = 10
+
+# Length of each window, None for all time
+WINDOWS = {'ALL': None, '30D': timedelta(days=30)}
+
+# Best first: fewest strokes over par, then fewest strokes, then whoever got there first
+RANKING = ['to_par', 'strokes', 'played_on', 'round_id']
+
+
+def _cutoff(window, now=None):
+    if WINDOWS[window] is None:
+        return None
+    return (now or timezone.now()) - WINDOWS[window]
+
+
+def _rank(entry):
+    return (entry.to_par, entry.strokes, entry.played_on, entry.round_id)
+
+
+# The best rounds on a board, one query on the leaderboard index
+def leaderboard(course_id, tee_color_id=None, window='ALL'):
+    entries = LeaderboardEntry.objects.filter(course_id=course_id, tee_color_id=tee_color_id, window=window)
+    cutoff = _cutoff(window)
+    if cutoff is not None:
+        entries = entries.filter(played_on__gte=cutoff)
+    return list(entries.select_related('round__created_by').order_by(*RANKING)[:TOP_N])
+
+
+# The boards a round summary belongs on as (course, tee color, window), empty if the round doesn't count
+def _boards(summary, now=None):
+    if not summary or summary['completed_on'] is None or not summary['created_by_id'] or not summary['course_id']:
+        return []
+    boards = []
+    for window in WINDOWS:
+        cutoff = _cutoff(window, now)
+        if cutoff is not None and summary['created_on'] < cutoff:
+            continue
+        boards.append((summary['course_id'], None, window))
+        if summary['tee_color_id']:
+            boards.append((summary['course_id'], summary['tee_color_id'], window))
+    return boards
+
+
+def _entry(summary, board):
+    course_id, tee_color_id, window = board
+    return LeaderboardEntry(course_id=course_id, tee_color_id=tee_color_id, window=window, round_id=summary['pk'],
+        to_par=summary['to_par'], strokes=summary['total_strokes'], played_on=summary['created_on'])
+
+
+def _board_entries(board):
+    course_id, tee_color_id, window = board
+    return LeaderboardEntry.objects.filter(course_id=course_id, tee_color_id=tee_color_id, window=window)
+
+
+# Called with the round summaries from round_totals_changed. The round's totals are already saved when this runs,
+# so a board refilled from the course's rounds picks the round up again if it still belongs there
+def record_round_change(previous, current):
+    removed, added = _boards(previous), _boards(current)
+    if not removed and not added:
+        return
+    round_id = (current or previous)['pk']
+    with transaction.atomic():
+        entries = LeaderboardEntry.objects.filter(round_id=round_id)
+        left = set(entries.values_list('course_id', 'tee_color_id', 'window'))
+        # A round leaving a full board makes room for the best round that isn't on it, a board that wasn't full just loses the round
+        full = {board for board in left if _board_entries(board).count() >= TOP_N}
+        entries.delete()
+        # A deleted round's entries are gone before the signal is sent, a board it was on is left one short of full
+        if current is None:
+            full.update(board for board in removed if _board_entries(board).count() == TOP_N - 1)
+        for board in full:
+            refill_board(board)
+        for board in added:
+            if board not in full:
+                _add_to_board(board, current)
+
+
+# Puts the round on the board if the board isn't full or the round beats its worst round, which then drops off.
+# A board still holding rounds past its window is refilled instead, since rounds that were pushed off it may count again
+def _add_to_board(board, summary):
+    entries = list(_board_entries(board).order_by(*RANKING))
+    cutoff = _cutoff(board[2])
+    if cutoff is not None and any(entry.played_on < cutoff for entry in entries):
+        refill_board(board)
+        return
+    entry = _entry(summary, board)
+    if len(entries) >= TOP_N and _rank(entry) > _rank(entries[-1]):
+        return
+    entry.save()
+    if len(entries) >= TOP_N:
+        dropped = sorted(entries + [entry], key=_rank)[TOP_N:]
+        LeaderboardEntry.objects.filter(pk__in=[entry.pk for entry in dropped]).delete()
+
+
+# Rebuilds one board from the course's completed rounds. Only runs when a round leaves a full board or a window rolls past its rounds
+def refill_board(board, now=None):
+    course_id, tee_color_id, window = board
+    rounds = Round.objects.filter(course_id=course_id, completed_on__isnull=False, created_by__isnull=False)
+    if tee_color_id:
+        rounds = rounds.filter(tee_color_id=tee_color_id)
+    cutoff = _cutoff(window, now)
+    if cutoff is not None:
+        rounds = rounds.filter(created_on__gte=cutoff)
+    best = rounds.order_by('to_par', 'total_strokes', 'created_on', 'pk')[:TOP_N]
+    _board_entries(board).delete()
+    LeaderboardEntry.objects.bulk_create([_entry(round.summary(), board) for round in best])
+
+
+# Takes rounds that are past their window off the boards and refills the boards they left
+def prune_leaderboards(now=None):
+    boards = set()
+    pruned = 0
+    with transaction.atomic():
+        for window in WINDOWS:
+            cutoff = _cutoff(window, now)
+            if cutoff is None:
+                continue
+            expired = LeaderboardEntry.objects.filter(window=window, played_on__lt=cutoff)
+            boards.update((course_id, tee_color_id, window) for course_id, tee_color_id in expired.values_list('course_id', 'tee_color_id').distinct())
+            pruned += expired.delete()[0]
+        for board in boards:
+            refill_board(board, now)
+    return pruned
+
+
+# Rebuilds every board from one pass over the completed rounds in ranking order, keeping the first TOP_N rounds seen for each board
+def rebuild_leaderboards(batch_size=500):
+    now = timezone.now()
+    rounds = (Round.objects.filter(completed_on__isnull=False, created_by__isnull=False, course__isnull=False)
+        .order_by('course_id', 'to_par', 'total_strokes', 'created_on', 'pk'))
+    boards = defaultdict(list)
+    for round in rounds.iterator(chunk_size=batch_size):
+        summary = round.summary()
+        for board in _boards(summary, now):
+            if len(boards[board]) < TOP_N:
+                boards[board].append(_entry(summary, board))
+    with transaction.atomic():
+        LeaderboardEntry.objects.all().delete()
+        LeaderboardEntry.objects.bulk_create([entry for entries in boards.values() for entry in entries], batch_size=batch_size)
+    return len(boards)
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from golfapp.handicaps import backfill_handicaps
+
+
+# Works out the score differentials and handicap index of every golfer from their completed rounds on rated tees.
+# Run rebuild_round_totals first for rounds entered before totals were stored
+class Command(BaseCommand):
+    help = "Rebuild every golfer's score differentials and handicap index from their completed rounds, oldest round first."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500, help='Number of rounds to read per query.')
+
+    def handle(self, *args, **options):
+        golfers = backfill_handicaps(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS('Rebuilt handicaps for %d golfers.' % golfers))
@@ -0,0 +1,48 @@
+import re
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count
+
+from golfapp.images import delete_variants, make_variants
+from golfapp.models import CoursePicture, StoredFile
+from golfapp.storage import content_hash
+
+HASHED_NAME = re.compile(r'/[0-9a-f]{2}/[0-9a-f]{64}(\.\w+)?$')
+
+
+# Moves pictures uploaded before content addressed storage to their hashed names, so copies of the same picture share one file,
+# counts the pictures using each file and deletes the old copies. Variants of moved pictures are made again under the new names
+class Command(BaseCommand):
+    help = 'Store every course picture under the hash of its content, dropping duplicate copies, and rebuild the file reference counts.'
+
+    def handle(self, *args, **options):
+        storage = CoursePicture._meta.get_field('picture').storage
+        moved = {}
+        for pk, name in CoursePicture.objects.order_by('pk').values_list('pk', 'picture').iterator():
+            if not name or HASHED_NAME.search(name):
+                continue
+            if name not in moved:
+                if not storage.exists(name):
+                    self.stderr.write('Picture %d is missing its file %s' % (pk, name))
+                    continue
+                with storage.open(name, 'rb') as content:
+                    content.content_hash = content_hash(content)
+                    moved[name] = storage.hashed_name(name, content.content_hash)
+                    if not storage.exists(moved[name]):
+                        storage.save(name, content)
+            CoursePicture.objects.filter(pk=pk).update(picture=moved[name], variants='{}')
+
+        with transaction.atomic():
+            StoredFile.objects.all().delete()
+            StoredFile.objects.bulk_create([
+                StoredFile(name=row['picture'], references=row['pictures'])
+                for row in CoursePicture.objects.exclude(picture='').order_by().values('picture').annotate(pictures=Count('pk'))
+            ])
+
+        for name in moved:
+            storage.delete(name)
+            delete_variants(storage, name)
+        for picture in CoursePicture.objects.filter(picture__in=set(moved.values()), variants='{}').order_by('pk'):
+            make_variants(picture)
+        self.stdout.write(self.style.SUCCESS('Moved %d files to %d content addressed files.' % (len(moved), len(set(moved.values())))))
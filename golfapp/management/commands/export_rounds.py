@@ -0,0 +1,32 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from golfapp.exports import FORMATS, export_rows
+from golfapp.models import GolferUser, Round
+
+
+# Writes rounds with a row per hole played to a file or standard output, see exports.py
+class Command(BaseCommand):
+    help = "Export a golfer's rounds, or every golfer's with no --golfer, as CSV or NDJSON."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--golfer', help='Username of the golfer whose rounds are exported.')
+        parser.add_argument('--format', choices=sorted(FORMATS), default='csv')
+        parser.add_argument('--output', default='-', help='File to write, - for standard output.')
+        parser.add_argument('--chunk-size', type=int, default=2000, help='Number of rows read from the database at a time.')
+
+    def handle(self, *args, **options):
+        rounds = Round.objects.all()
+        if options['golfer']:
+            golfer = GolferUser.objects.filter(username=options['golfer']).first()
+            if golfer is None:
+                raise CommandError('There is no golfer %s.' % options['golfer'])
+            rounds = rounds.filter(created_by=golfer)
+        lines = FORMATS[options['format']][0]
+        output = sys.stdout if options['output'] == '-' else open(options['output'], 'w', newline='', encoding='utf-8')
+        try:
+            output.writelines(lines(export_rows(rounds, chunk_size=options['chunk_size'])))
+        finally:
+            if output is not sys.stdout:
+                output.close()
@@ -0,0 +1,35 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from golfapp.importer import PARSERS, import_courses
+
+
+# Loads courses, holes and tees from a CSV or NDJSON file, see importer.py for the layout of the files
+class Command(BaseCommand):
+    help = 'Import courses with their holes and tees from a CSV or NDJSON file. Importing a file again updates what changed.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='File to import, - for standard input.')
+        parser.add_argument('--format', choices=sorted(PARSERS), help='Format of the file, taken from its extension when not given.')
+        parser.add_argument('--chunk-size', type=int, default=500, help='Number of courses written per transaction.')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        format = options['format'] or path.rsplit('.', 1)[-1].lower()
+        if format not in PARSERS:
+            raise CommandError('Give --format for %s, it could not be told from the file name.' % path)
+        try:
+            stream = sys.stdin if path == '-' else open(path, newline='', encoding='utf-8')
+        except OSError as error:
+            raise CommandError('Could not open %s: %s' % (path, error))
+        with stream:
+            result = import_courses(stream, format, chunk_size=options['chunk_size'])
+        for line, message in result.errors:
+            self.stderr.write('Line %d: %s' % (line, message))
+        if result.error_count > len(result.errors):
+            self.stderr.write('... and %d more errors.' % (result.error_count - len(result.errors)))
+        self.stdout.write(self.style.SUCCESS(
+            'Courses: %d created, %d updated. Holes: %d created, %d updated. Tees: %d created, %d updated. %d rows skipped.' % (
+                result.courses_created, result.courses_updated, result.holes_created, result.holes_updated,
+                result.tees_created, result.tees_updated, result.error_count)))
@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+
+from golfapp.images import make_variants
+from golfapp.models import CoursePicture
+
+
+# Makes the resized copies of pictures uploaded before variants were made, or of every picture with --all
+class Command(BaseCommand):
+    help = 'Make the thumbnail and medium WebP and JPEG variants of course pictures that are missing them.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true', help='Remake the variants of every picture.')
+
+    def handle(self, *args, **options):
+        pictures = CoursePicture.objects.order_by('pk')
+        if not options['all']:
+            pictures = pictures.filter(variants='{}')
+        made = 0
+        for picture in pictures.iterator():
+            try:
+                make_variants(picture, remake=options['all'])
+            except (IOError, OSError) as error:
+                self.stderr.write('Could not read picture %d: %s' % (picture.pk, error))
+                continue
+            made += 1
+        self.stdout.write(self.style.SUCCESS('Made variants of %d pictures.' % made))
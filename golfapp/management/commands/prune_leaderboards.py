@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from golfapp.leaderboards import prune_leaderboards, rebuild_leaderboards
+
+
+# Run daily so rounds age out of the 30 day leaderboards and the rounds behind them move up.
+# --rebuild fills every leaderboard from the completed rounds, for rounds completed before leaderboards were kept
+class Command(BaseCommand):
+    help = 'Take rounds past their window off the course leaderboards, or rebuild every leaderboard with --rebuild.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rebuild', action='store_true', help='Rebuild every leaderboard from the completed rounds.')
+        parser.add_argument('--batch-size', type=int, default=500, help='Number of rounds to read per query when rebuilding.')
+
+    def handle(self, *args, **options):
+        if options['rebuild']:
+            boards = rebuild_leaderboards(batch_size=options['batch_size'])
+            self.stdout.write(self.style.SUCCESS('Rebuilt %d leaderboards.' % boards))
+        else:
+            pruned = prune_leaderboards()
+            self.stdout.write(self.style.SUCCESS('Took %d expired rounds off the leaderboards.' % pruned))
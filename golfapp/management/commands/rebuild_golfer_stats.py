@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from golfapp.statistics import rebuild_golfer_stats
+
+
+# Recomputes every golfer's course statistics from their completed rounds. Run rebuild_round_totals first for rounds entered before totals were stored
+class Command(BaseCommand):
+    help = "Rebuild every golfer's best, worst, average and median score at each course from their completed rounds."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500, help='Number of statistics rows to insert per query.')
+
+    def handle(self, *args, **options):
+        rows = rebuild_golfer_stats(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS('Rebuilt statistics for %d golfer and course pairs.' % rows))
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from golfapp.statistics import rebuild_hole_stats
+
+
+# Recomputes the scoring statistics of every hole from the scores of every round
+class Command(BaseCommand):
+    help = 'Rebuild the average, spread and scoring distribution of every hole, over all tees and for each color of tees.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500, help='Number of statistics rows to insert per query.')
+
+    def handle(self, *args, **options):
+        rows = rebuild_hole_stats(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS('Rebuilt %d hole statistics rows.' % rows))
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from golfapp.totals import rebuild_round_totals
+
+
+# Recomputes the stored totals of every round from its scores. Used to fill in rounds created before the totals were stored
+class Command(BaseCommand):
+    help = 'Rebuild the stored strokes, holes played and over/under par of every round from its scores.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500, help='Number of rounds to rebuild per transaction.')
+
+    def handle(self, *args, **options):
+        changed = rebuild_round_totals(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS('Rebuilt totals, %d rounds changed.' % changed))
@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from golfapp.database import checkpoint, optimize
+
+
+# Meant to run every few minutes from cron. The write-ahead log is checkpointed when connections commit too,
+# but only into a log that keeps its size, and never while readers are busy
+class Command(BaseCommand):
+    help = 'Checkpoint the SQLite write-ahead log and refresh the query planner statistics of every SQLite database.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--mode', choices=['PASSIVE', 'FULL', 'RESTART', 'TRUNCATE'], default='TRUNCATE',
+            help='Checkpoint mode, PASSIVE never waits for readers or writers.')
+
+    def handle(self, *args, **options):
+        for alias in connections:
+            connection = connections[alias]
+            if connection.vendor != 'sqlite':
+                continue
+            busy, log, copied = checkpoint(connection, options['mode'])
+            optimize(connection)
+            # SQLite answers -1 pages when the database isn't in WAL mode (the development profile), there is nothing to checkpoint
+            if log == -1:
+                self.stdout.write(self.style.SUCCESS('%s: not in WAL mode, optimized.' % alias))
+            elif busy:
+                self.stderr.write('%s: checkpoint was blocked, copied %d of %d log pages.' % (alias, copied, log))
+            else:
+                self.stdout.write(self.style.SUCCESS('%s: checkpointed %d log pages and optimized.' % (alias, copied)))
@@ -0,0 +1,24 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from golfapp.routers import replicas, sync_replicas
+
+
+# Copies the primary SQLite database to every replica in settings.DATABASE_REPLICAS, once or every --interval seconds
+class Command(BaseCommand):
+    help = 'Copy the primary SQLite database over the read replicas with the SQLite backup API.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interval', type=float, help='Keep copying, waiting this many seconds between copies.')
+
+    def handle(self, *args, **options):
+        if not replicas():
+            raise CommandError('There are no replicas in settings.DATABASE_REPLICAS.')
+        while True:
+            started = time.monotonic()
+            sync_replicas()
+            self.stdout.write('Copied the database to %s in %.2fs.' % (', '.join(replicas()), time.monotonic() - started))
+            if not options['interval']:
+                return
+            time.sleep(options['interval'])
@@ -0,0 +1,189 @@
+import mimetypes
+import os
+import re
+import stat
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import FileResponse, Http404, HttpResponse
+from django.utils._os import safe_join
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date, parse_http_date_safe
+from django.views.generic.base import View
+
+# Serves uploaded media in production. Conditional requests are answered with 304 from the ETag and Last-Modified validators,
+# single byte ranges with 206, and whole files are handed to the WSGI server's file wrapper so servers like gunicorn send them
+# with zero copy sendfile. With MEDIA_DELIVERY set to 'x-accel' (nginx) or 'x-sendfile' (Apache, lighttpd) the response only
+# carries a header telling the front proxy which file to send, and the proxy handles the bytes and ranges itself.
+# Content addressed pictures (see storage.py) never change, so they are cached for a year as immutable.
+# StaticFile serves collectstatic output the same way, along with precompressed copies of it.
+
+HASHED_NAME = re.compile(r'(^|/)[0-9a-f]{2}/([0-9a-f]{64})\.\w+$')
+RANGE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+# Fingerprinted static file names from the staticfiles manifest: golfapp.3f2a9c1b7d4e.css
+MANIFEST_NAME = re.compile(r'\.[0-9a-f]{12}\.\w+$')
+
+IMMUTABLE_CACHE = 'public, max-age=31536000, immutable'
+DEFAULT_CACHE = 'public, max-age=86400'
+STATIC_CACHE = 'public, max-age=3600'
+
+
+# A file object that stops after length bytes, so the WSGI server's file wrapper only sends the requested range.
+# It has no fileno, which keeps file wrappers from sending the rest of the file with sendfile
+class FileRange:
+    def __init__(self, file, start, length):
+        file.seek(start)
+        self.file = file
+        self.remaining = length
+
+    def read(self, size=-1):
+        if size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.file.read(size) if size else b''
+        self.remaining -= len(data)
+        return data
+
+    def close(self):
+        self.file.close()
+
+
+def media_etag(path, stats):
+    hashed = HASHED_NAME.search(path)
+    if hashed:
+        return '"%s"' % hashed.group(2)
+    return '"%x-%x"' % (stats.st_mtime_ns, stats.st_size)
+
+
+# (start, end) of a single satisfiable "bytes=" range, None to send the whole file, or False when no byte of the range exists.
+# Several ranges in one header are answered with the whole file, which the spec allows
+def parse_range(header, size):
+    match = RANGE.match(header.strip())
+    if not match or not any(match.groups()):
+        return None
+    first, last = match.groups()
+    if not first:
+        start, end = max(size - int(last), 0), size - 1
+    else:
+        start = int(first)
+        end = min(int(last), size - 1) if last else size - 1
+    if start > end or start >= size:
+        return False
+    return start, end
+
+
+# A range is only sent when If-Range still matches the file, otherwise the client gets the whole new file
+def _if_range_matches(request, etag, last_modified):
+    if_range = request.META.get('HTTP_IF_RANGE')
+    if not if_range:
+        return True
+    if if_range.startswith('"'):
+        return if_range == etag
+    return parse_http_date_safe(if_range) == last_modified
+
+
+class MediaFile(View):
+    document_root = None # settings.MEDIA_ROOT
+
+    def get_document_root(self):
+        return self.document_root or settings.MEDIA_ROOT
+
+    def get_delivery(self):
+        return getattr(settings, 'MEDIA_DELIVERY', 'django')
+
+    def get_cache_control(self, path):
+        return IMMUTABLE_CACHE if HASHED_NAME.search(path) else DEFAULT_CACHE
+
+    # The file to send for the request and its Content-Encoding, None when it is sent as it is
+    def choose_file(self, request, full_path):
+        return full_path, None
+
+    def get(self, request, path):
+        try:
+            full_path = safe_join(self.get_document_root(), path)
+        except SuspiciousFileOperation:
+            raise Http404
+        try:
+            stats = os.stat(full_path)
+        except OSError:
+            raise Http404
+        if not stat.S_ISREG(stats.st_mode):
+            raise Http404
+        content_type, encoding = mimetypes.guess_type(full_path)
+        content_type = content_type or 'application/octet-stream'
+        full_path, content_encoding = self.choose_file(request, full_path)
+        if content_encoding:
+            stats = os.stat(full_path)
+
+        etag = media_etag(path, stats) if not content_encoding else '"%x-%x"' % (stats.st_mtime_ns, stats.st_size)
+        last_modified = int(stats.st_mtime)
+        response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if response is None:
+            response = self.file_response(request, path, full_path, content_type, stats, etag, last_modified)
+            if content_encoding and response.status_code != 416:
+                response['Content-Encoding'] = content_encoding
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(last_modified)
+        response['Cache-Control'] = self.get_cache_control(path)
+        return response
+
+    def file_response(self, request, path, full_path, content_type, stats, etag, last_modified):
+        delivery = self.get_delivery()
+        if delivery == 'x-accel':
+            response = HttpResponse(content_type=content_type)
+            response['X-Accel-Redirect'] = getattr(settings, 'MEDIA_ACCEL_PREFIX', '/protected-media/') + quote(path)
+            return response
+        if delivery == 'x-sendfile':
+            response = HttpResponse(content_type=content_type)
+            response['X-Sendfile'] = full_path
+            return response
+
+        size = stats.st_size
+        byte_range = None
+        if 'HTTP_RANGE' in request.META and _if_range_matches(request, etag, last_modified):
+            byte_range = parse_range(request.META['HTTP_RANGE'], size)
+        if byte_range is False:
+            response = HttpResponse(status=416)
+            response['Content-Range'] = 'bytes */%d' % size
+            return response
+
+        start, end = byte_range or (0, size - 1)
+        if request.method == 'HEAD':
+            response = HttpResponse(content_type=content_type)
+        elif byte_range:
+            response = FileResponse(FileRange(open(full_path, 'rb'), start, end - start + 1), content_type=content_type)
+        else:
+            response = FileResponse(open(full_path, 'rb'), content_type=content_type)
+        if byte_range:
+            response.status_code = 206
+            response['Content-Range'] = 'bytes %d-%d/%d' % (start, end, size)
+        response['Content-Length'] = str(end - start + 1)
+        response['Accept-Ranges'] = 'bytes'
+        return response
+
+
+# Serves collectstatic output from STATIC_ROOT for deployments without a front proxy for static files.
+# Names fingerprinted by CompressedManifestStaticFilesStorage are immutable, and the gzip or brotli copy written next to a file
+# is sent instead of the file when the client accepts it
+class StaticFile(MediaFile):
+    def get_document_root(self):
+        return settings.STATIC_ROOT
+
+    def get_delivery(self):
+        return 'django'
+
+    def get_cache_control(self, path):
+        return IMMUTABLE_CACHE if MANIFEST_NAME.search(path) else STATIC_CACHE
+
+    def choose_file(self, request, full_path):
+        accepted = {coding.split(';')[0].strip() for coding in request.META.get('HTTP_ACCEPT_ENCODING', '').split(',')}
+        for coding, extension in (('br', '.br'), ('gzip', '.gz')):
+            if coding in accepted and os.path.isfile(full_path + extension):
+                return full_path + extension, coding
+        return full_path, None
+
+    def get(self, request, path):
+        response = super().get(request, path)
+        patch_vary_headers(response, ['Accept-Encoding'])
+        return response
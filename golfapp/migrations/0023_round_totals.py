@@ -0,0 +1,38 @@
+# Generated by Django 2.2.28 on 2026-10-18 06:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('golfapp', '0022_coursepicture_course'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='round',
+            name='holes_played',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='round',
+            name='played_mens_par',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='round',
+            name='played_womens_par',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='round',
+            name='to_par',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='round',
+            name='total_strokes',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 2.2.28 on 2026-10-18 06:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('golfapp', '0023_round_totals'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='round',
+            index=models.Index(fields=['created_by', '-created_on', '-id'], name='round_golfer_recent_idx'),
+        ),
+    ]
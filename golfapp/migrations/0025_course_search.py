@@ -0,0 +1,27 @@
+from django.db import migrations, models
+
+
+# The search table and triggers are only created on SQLite builds with FTS5, see golfapp.search
+def install_course_search(apps, schema_editor):
+    from golfapp.search import install_course_search
+    install_course_search(schema_editor.connection)
+
+
+def uninstall_course_search(apps, schema_editor):
+    from golfapp.search import uninstall_course_search
+    uninstall_course_search(schema_editor.connection)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('golfapp', '0024_round_golfer_recent_idx'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='course',
+            index=models.Index(fields=['name', 'id'], name='course_name_idx'),
+        ),
+        migrations.RunPython(install_course_search, uninstall_course_search),
+    ]
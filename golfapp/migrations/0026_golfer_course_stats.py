@@ -0,0 +1,31 @@
+# Generated by Django 2.2.28 on 2026-10-18 06:53
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('golfapp', '0025_course_search'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GolferCourseStats',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('rounds', models.IntegerField(default=0)),
+                ('strokes_sum', models.IntegerField(default=0)),
+                ('best', models.IntegerField(blank=True, null=True)),
+                ('worst', models.IntegerField(blank=True, null=True)),
+                ('distribution', models.TextField(default='{}')),
+                ('course', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='golfer_stats', to='golfapp.Course')),
+                ('golfer', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='course_stats', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'unique_together': {('golfer', 'course')},
+            },
+        ),
+    ]
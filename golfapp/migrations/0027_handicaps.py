@@ -0,0 +1,57 @@
+# Generated by Django 2.2.28 on 2026-10-18 06:55
+
+from django.conf import settings
+import django.core.validators
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('golfapp', '0026_golfer_course_stats'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ScoreDifferential',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('played_on', models.DateTimeField()),
+                ('adjusted_gross_score', models.IntegerField()),
+                ('differential', models.DecimalField(decimal_places=1, max_digits=4)),
+                ('golfer', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='score_differentials', to=settings.AUTH_USER_MODEL)),
+                ('round', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='differential', to='golfapp.Round')),
+            ],
+            options={
+                'ordering': ['-played_on', '-id'],
+            },
+        ),
+        migrations.CreateModel(
+            name='HandicapIndex',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('index', models.DecimalField(blank=True, decimal_places=1, max_digits=3, null=True)),
+                ('recent', models.TextField(default='[]')),
+                ('golfer', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='handicap', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='CourseRating',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('course_rating', models.DecimalField(decimal_places=1, max_digits=3, validators=[django.core.validators.MaxValueValidator(90), django.core.validators.MinValueValidator(20)])),
+                ('slope_rating', models.IntegerField(validators=[django.core.validators.MaxValueValidator(155), django.core.validators.MinValueValidator(55)])),
+                ('course', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='ratings', to='golfapp.Course')),
+                ('tee_color', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='ratings', to='golfapp.TeeColor')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='scoredifferential',
+            index=models.Index(fields=['golfer', '-played_on', '-id'], name='differential_recent_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='courserating',
+            unique_together={('course', 'tee_color')},
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 2.2.28 on 2026-10-18 06:57
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('golfapp', '0027_handicaps'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='HoleStats',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('scores', models.IntegerField(default=0)),
+                ('strokes_sum', models.IntegerField(default=0)),
+                ('strokes_squares', models.IntegerField(default=0)),
+                ('distribution', models.TextField(default='{}')),
+                ('hole', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stats', to='golfapp.Hole')),
+                ('tee_color', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='hole_stats', to='golfapp.TeeColor')),
+            ],
+            options={
+                'unique_together': {('hole', 'tee_color')},
+            },
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 2.2.28 on 2026-10-18 06:59
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('golfapp', '0028_hole_stats'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LeaderboardEntry',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('window', models.CharField(choices=[('ALL', 'All time'), ('30D', 'Last 30 days')], max_length=3)),
+                ('to_par', models.IntegerField()),
+                ('strokes', models.IntegerField()),
+                ('played_on', models.DateTimeField()),
+                ('course', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='leaderboard', to='golfapp.Course')),
+                ('round', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='leaderboard_entries', to='golfapp.Round')),
+                ('tee_color', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='leaderboard', to='golfapp.TeeColor')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='leaderboardentry',
+            index=models.Index(fields=['course', 'window', 'tee_color', 'to_par', 'strokes', 'played_on', 'round'], name='leaderboard_idx'),
+        ),
+    ]
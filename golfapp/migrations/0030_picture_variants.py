@@ -0,0 +1,18 @@
+# Generated by Django 2.2.28 on 2026-10-18 07:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('golfapp', '0029_leaderboards'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='coursepicture',
+            name='variants',
+            field=models.TextField(default='{}', editable=False),
+        ),
+    ]
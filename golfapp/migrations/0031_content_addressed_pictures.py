@@ -0,0 +1,27 @@
+# Generated by Django 2.2.28 on 2026-10-18 07:02
+
+from django.db import migrations, models
+import golfapp.storage
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('golfapp', '0030_picture_variants'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StoredFile',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=255, unique=True)),
+                ('references', models.IntegerField(default=0)),
+            ],
+        ),
+        migrations.AlterField(
+            model_name='coursepicture',
+            name='picture',
+            field=models.ImageField(storage=golfapp.storage.ContentAddressedStorage(), upload_to='uploads/course/', verbose_name='image'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 2.2.28 on 2026-10-18 07:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('golfapp', '0031_content_addressed_pictures'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='coursepicture',
+            index=models.Index(fields=['course', '-created_on', '-id'], name='coursepicture_recent_idx'),
+        ),
+    ]
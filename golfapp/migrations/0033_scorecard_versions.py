@@ -0,0 +1,28 @@
+# Generated by Django 2.2.28 on 2026-10-18 07:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('golfapp', '0032_coursepicture_recent_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='course',
+            name='scorecard_version',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='course',
+            name='stats_version',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='round',
+            name='scorecard_version',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 2.2.28 on 2026-10-18 07:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('golfapp', '0034_updated_at'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='hole',
+            index=models.Index(fields=['course', 'number'], name='hole_course_number_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='tee',
+            index=models.Index(fields=['hole', 'color', 'yards'], name='tee_hole_color_yards_idx'),
+        ),
+    ]
@@ -1,10 +1,13 @@
 from django.contrib.auth.models import AbstractUser # To create a custom user model
 from django.core.validators import MaxValueValidator, MinValueValidator # To set minimum and maximum integer valuses
 from django.conf import settings
+import json
 from datetime import datetime, time, date
 from django.utils import timezone
 from django.db import models
 
+from .storage import picture_storage
+
 # Hardcoded list of possible Tee colors to choose from. Currently used to set the options for the tee select fields
 # Planned to change the way the select list chooses tee colors
 COLOR_CHOICES = (
@@ -35,17 +38,37 @@ class GolferUser(AbstractUser):
 #   Course related models   #
 # # # # # # # # # # # # # # #
 
+# Counters that are only ever bumped with an UPDATE (see scorecards.py). Saving an instance loaded earlier leaves them out,
+# otherwise an old count would be written back and a cached fragment of an older scorecard could be served again
+class CounterFieldsMixin:
+    counter_fields = ()
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding and kwargs.get('update_fields') is None and not kwargs.get('force_insert'):
+            kwargs['update_fields'] = [field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in self.counter_fields]
+        super().save(*args, **kwargs)
+
 # Course model 
-class Course(models.Model):
+class Course(CounterFieldsMixin, models.Model):
     name = models.CharField(max_length=255)
     city = models.CharField(max_length=255)
     state = models.CharField(max_length=255)
     tee_colors = models.ManyToManyField('TeeColor', blank=False, related_name='courses') # Each hole must be attached to a course.
+    # Cached course scorecards are keyed on these. Layout changes (holes, tees, tee colors) bump the first, hole statistics the second
+    scorecard_version = models.IntegerField(default=0, editable=False)
+    stats_version = models.IntegerField(default=0, editable=False)
+    counter_fields = ('scorecard_version', 'stats_version')
+    # Changes to the course's holes, tees and hole statistics move this forward too, it answers conditional requests for the course page
+    updated_at = models.DateTimeField(auto_now=True)
     # Planned to add picture field 
     # Planned to add user comments field
 
     class Meta:
         ordering = ['name']
+        indexes = [
+            models.Index(fields=['name', 'id'], name='course_name_idx'), # Course list pages
+        ]
     
     def __str__(self):
         return self.name
@@ -66,9 +89,13 @@ class Hole(models.Model):
     course = models.ForeignKey('Course', on_delete=models.SET_NULL, null=True, blank=False, related_name='holes') # Each hole must be attached to a course.
     mens_par = models.IntegerField(validators=[MaxValueValidator(10), MinValueValidator(1)])
     womens_par = models.IntegerField(validators=[MaxValueValidator(10), MinValueValidator(1)])
+    updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         unique_together = (('number','course'),('name', 'course')) # Each course can only have one hole with each number... not exactly true but for simplicity that is how this will work for now
+        indexes = [
+            models.Index(fields=['course', 'number'], name='hole_course_number_idx'), # A course's holes in order
+        ]
 
     def __str__(self):
         if (self.name):
@@ -82,21 +109,69 @@ class Tee(models.Model):
     color = models.CharField(choices=COLOR_CHOICES, blank=True, null=True, max_length=255)
     yards = models.IntegerField(validators=[MaxValueValidator(1000), MinValueValidator(1)])
     hole = models.ForeignKey('Hole', on_delete=models.SET_NULL, null=True, blank=False, related_name='tees')
+    updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         unique_together = (('color','hole'),) # only have one of each color on the hole
+        indexes = [
+            models.Index(fields=['hole', 'color', 'yards'], name='tee_hole_color_yards_idx'), # Covers the yards of a hole for a tee color
+        ]
 
     def __str__(self):
         return str(self.yards) + str(Hole)
 
+# The uploaded original is kept as it is, under the hash of its content (see storage.py) so duplicate uploads share one file.
+# Resized copies without EXIF data are made off the request thread (see images.py) and pages show those,
+# falling back to the original until they are ready
 class CoursePicture(models.Model):
     created_by = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True)
     created_on = models.DateTimeField(default=datetime.now)
-    picture = models.ImageField(upload_to='uploads/course/', verbose_name='image')
+    picture = models.ImageField(upload_to='uploads/course/', storage=picture_storage, verbose_name='image')
     course = models.ForeignKey('Course', on_delete=models.SET_NULL, null=True, blank=False, related_name='pictures') 
+    variants = models.TextField(default='{}', editable=False) # JSON of {size: {'width', 'height', 'webp': path, 'jpeg': path}}
 
     class Meta:
         ordering = ['-created_on']
+        indexes = [
+            models.Index(fields=['course', '-created_on', '-id'], name='coursepicture_recent_idx'), # Course picture gallery pages
+        ]
+
+    def get_variants(self):
+        return json.loads(self.variants)
+
+    # srcset value listing every size of the picture in one format
+    def srcset(self, format):
+        storage = self.picture.storage
+        return ', '.join('%s %dw' % (storage.url(variant[format]), variant['width']) for variant in self.get_variants().values())
+
+    @property
+    def webp_srcset(self):
+        return self.srcset('webp')
+
+    @property
+    def jpeg_srcset(self):
+        return self.srcset('jpeg')
+
+    def variant_url(self, size):
+        variant = self.get_variants().get(size)
+        return self.picture.storage.url(variant['jpeg']) if variant else self.picture.url
+
+    @property
+    def thumbnail_url(self):
+        return self.variant_url('thumbnail')
+
+    @property
+    def medium_url(self):
+        return self.variant_url('medium')
+
+
+# Number of course pictures using each stored file. Duplicate uploads share a file, which is deleted once nothing uses it
+class StoredFile(models.Model):
+    name = models.CharField(max_length=255, unique=True)
+    references = models.IntegerField(default=0)
+
+    def __str__(self):
+        return '%s (%d)' % (self.name, self.references)
 
 
 # # # # # # # # # # # # # # #
@@ -107,16 +182,45 @@ class CoursePicture(models.Model):
 # Each round is played at a single golf course. The total number of scores is the number of holes. 
 # Currently the user will choose a set of tees to play. That is the usual way to play. In the future I may want to allow the user to choose a tee color for each hole
 # Planned to use the completed_on field to sum up scores and display them if the round is completed
-class Round(models.Model):
+class Round(CounterFieldsMixin, models.Model):
     course = models.ForeignKey('Course', on_delete=models.SET_NULL, null=True)
     name = models.CharField(max_length=255, null=True, blank=True, verbose_name='Title this round (optional)')
     created_by = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True)
     created_on = models.DateTimeField(default=datetime.now)
     completed_on = models.DateTimeField(null=True, blank=True)
     tee_color = models.ForeignKey('TeeColor', on_delete=models.SET_NULL, null=True, blank=False, related_name='teecolor')
+    # Totals are stored on the round and kept up to date as scores change so lists and headers don't have to sum the scores
+    total_strokes = models.IntegerField(default=0, editable=False)
+    holes_played = models.IntegerField(default=0, editable=False)
+    played_mens_par = models.IntegerField(default=0, editable=False) # Par of the holes that have a score
+    played_womens_par = models.IntegerField(default=0, editable=False)
+    to_par = models.IntegerField(default=0, editable=False) # Over/under par for the golfer's gender
+    scorecard_version = models.IntegerField(default=0, editable=False) # Bumped when the round's scores change, keys the cached round scorecard
+    updated_at = models.DateTimeField(auto_now=True) # Moved forward by score and total changes too
+
+    # completed_on is kept with the totals, a round is completed once every hole of its course has a score
+    TOTAL_FIELDS = ['total_strokes', 'holes_played', 'played_mens_par', 'played_womens_par', 'to_par', 'completed_on']
+    counter_fields = ('scorecard_version',)
 
     class Meta:
         ordering = ['-created_on']
+        indexes = [
+            models.Index(fields=['created_by', '-created_on', '-id'], name='round_golfer_recent_idx'), # Home page list of a golfer's rounds
+        ]
+
+    # The stored totals along with the golfer, course and tee color they count towards.
+    # Rollups built from rounds compare the summary from before and after a change
+    def summary(self):
+        values = {field: getattr(self, field) for field in self.TOTAL_FIELDS}
+        values.update(pk=self.pk, created_by_id=self.created_by_id, course_id=self.course_id, tee_color_id=self.tee_color_id, created_on=self.created_on)
+        return values
+
+    # Mens par is used for male golfers, everyone else is compared to the womens par
+    def set_to_par(self):
+        if self.created_by and self.created_by.gender == 'MALE':
+            self.to_par = self.total_strokes - self.played_mens_par
+        else:
+            self.to_par = self.total_strokes - self.played_womens_par
 
 # Scores will hold the number of strokes a player takes
 # To function the Score model will need to be attached to a round as well as a hole. Each round can only have one score per hole.
@@ -125,6 +229,175 @@ class Score(models.Model):
     round = models.ForeignKey('Round', on_delete=models.SET_NULL, null=True)
     hole = models.ForeignKey('Hole', on_delete=models.SET_NULL, null=True)
     strokes = models.IntegerField(validators=[MaxValueValidator(100), MinValueValidator(1)])
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = (('round','hole'),) # only have one of each hole per round
+
+# # # # # # # # # # # # # # # #
+#   Statistics related models   #
+# # # # # # # # # # # # # # # #
+
+# Each golfer's scores at a course, kept up to date as their rounds are completed or change.
+# distribution maps a round's total strokes to the number of completed rounds with that total, best, worst and median are read from it
+class GolferCourseStats(models.Model):
+    golfer = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='course_stats')
+    course = models.ForeignKey('Course', on_delete=models.CASCADE, related_name='golfer_stats')
+    rounds = models.IntegerField(default=0)
+    strokes_sum = models.IntegerField(default=0)
+    best = models.IntegerField(null=True, blank=True)
+    worst = models.IntegerField(null=True, blank=True)
+    distribution = models.TextField(default='{}') # JSON of {total strokes: rounds}
+
+    class Meta:
+        unique_together = (('golfer', 'course'),)
+
+    def get_distribution(self):
+        return {int(strokes): rounds for strokes, rounds in json.loads(self.distribution).items()}
+
+    def set_distribution(self, distribution):
+        distribution = {strokes: rounds for strokes, rounds in distribution.items() if rounds > 0}
+        self.distribution = json.dumps(distribution, sort_keys=True)
+        self.rounds = sum(distribution.values())
+        self.strokes_sum = sum(strokes * rounds for strokes, rounds in distribution.items())
+        self.best = min(distribution) if distribution else None
+        self.worst = max(distribution) if distribution else None
+
+    # (total strokes, rounds) pairs from the best total to the worst
+    def distribution_items(self):
+        return sorted(self.get_distribution().items())
+
+    @property
+    def mean(self):
+        return self.strokes_sum / self.rounds if self.rounds else None
+
+    # Walks the distribution instead of the rounds, so the cost depends on how many different totals there are
+    @property
+    def median(self):
+        if not self.rounds:
+            return None
+        middle = [(self.rounds - 1) // 2, self.rounds // 2]
+        values, seen = [], 0
+        for strokes, rounds in self.distribution_items():
+            while middle and middle[0] < seen + rounds:
+                values.append(strokes)
+                middle.pop(0)
+            seen += rounds
+        return sum(values) / 2
+
+# How a hole plays across every round, for all tees (tee_color is None) and for each color of tees.
+# distribution maps strokes relative to par to the number of scores, using the par for each golfer's gender
+class HoleStats(models.Model):
+    hole = models.ForeignKey('Hole', on_delete=models.CASCADE, related_name='stats')
+    tee_color = models.ForeignKey('TeeColor', on_delete=models.CASCADE, null=True, blank=True, related_name='hole_stats')
+    scores = models.IntegerField(default=0)
+    strokes_sum = models.IntegerField(default=0)
+    strokes_squares = models.IntegerField(default=0) # Sum of the squared strokes, for the standard deviation
+    distribution = models.TextField(default='{}') # JSON of {strokes - par: scores}
+
+    # Scoring names from the distribution, the first and last take in everything better or worse
+    BUCKETS = [(-2, 'Eagle or better'), (-1, 'Birdie'), (0, 'Par'), (1, 'Bogey'), (2, 'Double or worse')]
+
+    class Meta:
+        unique_together = (('hole', 'tee_color'),)
+
+    def get_distribution(self):
+        return {int(to_par): scores for to_par, scores in json.loads(self.distribution).items()}
+
+    # Adds count scores of strokes, a negative count takes them away
+    def add_scores(self, strokes, to_par, count=1):
+        distribution = self.get_distribution()
+        distribution[to_par] = distribution.get(to_par, 0) + count
+        self.distribution = json.dumps({key: value for key, value in distribution.items() if value > 0}, sort_keys=True)
+        self.scores += count
+        self.strokes_sum += count * strokes
+        self.strokes_squares += count * strokes * strokes
+
+    @property
+    def mean(self):
+        return self.strokes_sum / self.scores if self.scores else None
+
+    @property
+    def mean_to_par(self):
+        if not self.scores:
+            return None
+        return sum(to_par * scores for to_par, scores in self.get_distribution().items()) / self.scores
+
+    @property
+    def stddev(self):
+        if not self.scores:
+            return None
+        return max(self.strokes_squares / self.scores - self.mean ** 2, 0) ** 0.5
+
+    # (name, share of scores) for each of BUCKETS
+    def buckets(self):
+        counts = dict.fromkeys([to_par for to_par, name in self.BUCKETS], 0)
+        low, high = self.BUCKETS[0][0], self.BUCKETS[-1][0]
+        for to_par, scores in self.get_distribution().items():
+            counts[min(max(to_par, low), high)] += scores
+        return [(name, counts[to_par] / self.scores if self.scores else 0) for to_par, name in self.BUCKETS]
+
+
+# A completed round on one of a course's leaderboards. A board is a course, a tee color (None for all tees) and a window of time,
+# and only keeps its best rounds so showing it is one read of the leaderboard index
+class LeaderboardEntry(models.Model):
+    WINDOW_CHOICES = ( ('ALL', 'All time'),
+                       ('30D', 'Last 30 days'),
+    )
+    course = models.ForeignKey('Course', on_delete=models.CASCADE, related_name='leaderboard')
+    tee_color = models.ForeignKey('TeeColor', on_delete=models.CASCADE, null=True, blank=True, related_name='leaderboard')
+    window = models.CharField(choices=WINDOW_CHOICES, max_length=3)
+    round = models.ForeignKey('Round', on_delete=models.CASCADE, related_name='leaderboard_entries')
+    to_par = models.IntegerField()
+    strokes = models.IntegerField()
+    played_on = models.DateTimeField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['course', 'window', 'tee_color', 'to_par', 'strokes', 'played_on', 'round'], name='leaderboard_idx'), # Boards in ranking order
+        ]
+
+
+# # # # # # # # # # # # # # #
+#   Handicap related models   #
+# # # # # # # # # # # # # # #
+
+# Course rating and slope rating of a course played from one color of tees. Rounds are only used for handicaps when their tees are rated
+class CourseRating(models.Model):
+    course = models.ForeignKey('Course', on_delete=models.CASCADE, related_name='ratings')
+    tee_color = models.ForeignKey('TeeColor', on_delete=models.CASCADE, related_name='ratings')
+    course_rating = models.DecimalField(max_digits=3, decimal_places=1, validators=[MaxValueValidator(90), MinValueValidator(20)])
+    slope_rating = models.IntegerField(validators=[MaxValueValidator(155), MinValueValidator(55)])
+
+    class Meta:
+        unique_together = (('course', 'tee_color'),) # One rating for each set of tees
+
+    def __str__(self):
+        return '%s %s (%s / %d)' % (self.course, self.tee_color, self.course_rating, self.slope_rating)
+
+# The score differential of a completed round on rated tees, worked out once when the round is completed
+class ScoreDifferential(models.Model):
+    golfer = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='score_differentials')
+    round = models.OneToOneField('Round', on_delete=models.CASCADE, related_name='differential')
+    played_on = models.DateTimeField()
+    adjusted_gross_score = models.IntegerField()
+    differential = models.DecimalField(max_digits=4, decimal_places=1)
 
     class Meta:
-        unique_together = (('round','hole'),) # only have one of each hole per round
\ No newline at end of file
+        ordering = ['-played_on', '-id']
+        indexes = [
+            models.Index(fields=['golfer', '-played_on', '-id'], name='differential_recent_idx'), # A golfer's 20 most recent differentials
+        ]
+
+# Each golfer's handicap index along with the differentials of their 20 most recent rated rounds, so a new round
+# only has to be slotted into the window instead of reading the golfer's history again
+class HandicapIndex(models.Model):
+    golfer = models.OneToOneField(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='handicap')
+    index = models.DecimalField(max_digits=3, decimal_places=1, null=True, blank=True) # Needs at least 3 rated rounds
+    recent = models.TextField(default='[]') # JSON of [round id, played on, differential], most recent first
+
+    def get_recent(self):
+        return json.loads(self.recent)
+
+    def set_recent(self, recent):
+        self.recent = json.dumps(recent)
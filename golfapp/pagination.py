@@ -0,0 +1,77 @@
+import base64
+import binascii
+import json
+
+from django.db.models import Q
+
+# Keyset (cursor) pagination. Each page starts right after the ordering values of the last row of the page before it,
+# so the database seeks straight to the page through an index instead of counting past every earlier row.
+# The last ordering field must be unique (usually the primary key) so rows with equal values aren't skipped.
+
+
+class KeysetPage:
+    def __init__(self, object_list, next_cursor):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+
+# ordering is a list of field names like the one given to order_by, '-' for descending
+def paginate_keyset(queryset, ordering, cursor=None, per_page=20):
+    queryset = queryset.order_by(*ordering)
+    values = decode_cursor(cursor, len(ordering))
+    if values is not None:
+        queryset = queryset.filter(_after(ordering, values))
+    rows = list(queryset[:per_page + 1])
+    next_cursor = None
+    if len(rows) > per_page:
+        rows = rows[:per_page]
+        next_cursor = encode_cursor([_value(rows[-1], field.lstrip('-')) for field in ordering])
+    return KeysetPage(rows, next_cursor)
+
+
+def encode_cursor(values):
+    values = [value.isoformat() if hasattr(value, 'isoformat') else value for value in values]
+    return base64.urlsafe_b64encode(json.dumps(values).encode()).decode().rstrip('=')
+
+
+# Returns None for a missing or malformed cursor so a bad link just shows the first page
+def decode_cursor(cursor, length):
+    if not cursor:
+        return None
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode())
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        return None
+    if not isinstance(values, list) or len(values) != length:
+        return None
+    return values
+
+
+# Rows after the cursor for ordering (a, b, c): a past x, or a = x and b past y, or a = x and b = y and c past z.
+# The leading a <= x (or >= x) bound is implied by the rest but lets the database seek the index to the cursor
+def _after(ordering, values):
+    names = [field.lstrip('-') for field in ordering]
+    lookups = ['lt' if field.startswith('-') else 'gt' for field in ordering]
+    after = Q()
+    for index, name in enumerate(names):
+        condition = Q(**{name + '__' + lookups[index]: values[index]})
+        for previous in range(index):
+            condition &= Q(**{names[previous]: values[previous]})
+        after |= condition
+    return Q(**{names[0] + '__' + lookups[0] + 'e': values[0]}) & after
+
+
+def _value(row, name):
+    if isinstance(row, dict):
+        return row[name]
+    return getattr(row, name)
@@ -0,0 +1,79 @@
+import random
+import sqlite3
+import threading
+import time
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+# Sends the reads of GET and HEAD requests to the databases in settings.DATABASE_REPLICAS and everything else to the primary.
+# Replicas are only read from while ReplicaMiddleware allows it, so writes, management commands and background threads always read
+# what they just wrote. After a golfer posts something their reads stay on the primary for REPLICA_STICKY_SECONDS,
+# long enough for the replicas to catch up, so their new score shows up on the page they are sent to.
+# SQLite replicas are copies of the primary made with the SQLite backup API, refreshed by the sync_replicas command.
+
+STICKY_COOKIE = 'primary_until'
+
+_state = threading.local()
+
+
+def replicas():
+    return getattr(settings, 'DATABASE_REPLICAS', [])
+
+
+def use_replicas():
+    return getattr(_state, 'use_replicas', False)
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        if not replicas() or not use_replicas() or connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        return random.choice(replicas())
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    # Replicas get their tables with the rest of the copy
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db not in replicas()
+
+
+class ReplicaMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        sticky = self._sticky_until(request) > time.time()
+        _state.use_replicas = request.method in ('GET', 'HEAD') and not sticky
+        try:
+            response = self.get_response(request)
+        finally:
+            _state.use_replicas = False
+        if request.method not in ('GET', 'HEAD', 'OPTIONS', 'TRACE') and replicas():
+            seconds = getattr(settings, 'REPLICA_STICKY_SECONDS', 10)
+            response.set_cookie(STICKY_COOKIE, str(int(time.time() + seconds)), max_age=seconds, httponly=True, samesite='Lax')
+        return response
+
+    def _sticky_until(self, request):
+        try:
+            return int(request.COOKIES.get(STICKY_COOKIE, 0))
+        except ValueError:
+            return 0
+
+
+# Copies the primary SQLite database over each replica with the backup API, which gives a consistent copy while the primary is written to.
+# Open connections to the replicas in this process are closed first so they see the new copy
+def sync_replicas(aliases=None):
+    source = connections[DEFAULT_DB_ALIAS]
+    source.ensure_connection()
+    for alias in aliases or replicas():
+        connections[alias].close()
+        target = sqlite3.connect(connections[alias].settings_dict['NAME'], timeout=30)
+        try:
+            source.connection.backup(target)
+        finally:
+            target.close()
@@ -0,0 +1,99 @@
+from collections import namedtuple
+
+from django.db.models import F, OuterRef, Subquery
+from django.utils import timezone
+
+from .models import Course, Hole, HoleStats, Round, Tee, Score
+
+# Scorecards are built in python from a small fixed number of queries so the templates only loop over prebuilt rows.
+# Template cost is holes x tee colors no matter how many courses and tees are in the database.
+# The rendered cards are cached as template fragments keyed on version counters, so a change never has to find the fragments to delete:
+# Course.scorecard_version counts changes to a course's holes, tees and tee colors, Course.stats_version changes to its hole statistics
+# and Round.scorecard_version changes to a round's scores. The counters are bumped in the transaction making the change and pages read
+# them before building the card, so a fragment is never older than the versions it is cached under.
+# Bumping a counter also moves the course's or round's updated_at forward, which the pages answer conditional requests from.
+
+# One column of the course scorecard. cells holds a (color, tee, stats) triple for every tee color of the course, tee is None when the hole
+# has no tee of that color yet and stats is None until a round from those tees has a score on the hole.
+# stats is the hole's HoleStats over all tees and difficulty its rank on the course, 1 being the hardest compared to par
+CourseScorecardRow = namedtuple('CourseScorecardRow', ['hole', 'cells', 'stats', 'difficulty'])
+
+
+class CourseScorecard:
+    def __init__(self, course, colors, rows):
+        self.course = course
+        self.colors = colors
+        self.rows = rows
+
+
+# Fetches the course's tee colors, holes, tees and hole statistics (4 queries) and builds the hole x color yardage matrix.
+# The statistics are kept up to date as scores are written, so nothing is aggregated here
+def build_course_scorecard(course, with_stats=True):
+    colors = sorted(course.tee_colors.all(), key=lambda color: color.pk) # a handful of rows, sorting them here saves the database a temporary sort
+    holes = list(Hole.objects.filter(course_id=course.pk).order_by('number'))
+    tees = {}
+    for tee in Tee.objects.filter(hole__course_id=course.pk):
+        tees[(tee.hole_id, tee.color)] = tee
+    stats = {}
+    if with_stats:
+        stats = {(row.hole_id, row.tee_color_id): row for row in HoleStats.objects.filter(hole__course_id=course.pk)}
+    hardest = sorted((row for row in stats.values() if row.tee_color_id is None), key=lambda row: (-row.mean_to_par, row.hole_id))
+    difficulty = {row.hole_id: rank for rank, row in enumerate(hardest, 1)}
+
+    rows = []
+    for hole in holes:
+        hole.course = course # avoids a query per hole when the hole is displayed
+        cells = [(color, tees.get((hole.pk, color.color)), stats.get((hole.pk, color.pk))) for color in colors]
+        rows.append(CourseScorecardRow(hole, cells, stats.get((hole.pk, None)), difficulty.get(hole.pk)))
+    return CourseScorecard(course, colors, rows)
+
+
+# One column of a round scorecard. yards and strokes are None when the hole has no tee of the round's color or no score yet
+RoundScorecardRow = namedtuple('RoundScorecardRow', ['hole_pk', 'number', 'name', 'yards', 'mens_par', 'womens_par', 'strokes'])
+
+
+# Stroke totals and over/under par are stored on the round itself
+class RoundScorecard:
+    def __init__(self, round, rows):
+        self.round = round
+        self.rows = rows
+        self.total_yards = sum(row.yards or 0 for row in rows)
+        self.total_mens_par = sum(row.mens_par for row in rows)
+        self.total_womens_par = sum(row.womens_par for row in rows)
+
+
+# The yards for the round's tee color and the strokes for this round are pulled in with subqueries,
+# so the whole card is one query over the course's holes using the (color, hole) and (round, hole) unique indexes
+def build_round_scorecard(round):
+    color = round.tee_color.color if round.tee_color else None
+    yards = Tee.objects.filter(hole_id=OuterRef('pk'), color=color).values('yards')[:1]
+    strokes = Score.objects.filter(hole_id=OuterRef('pk'), round_id=round.pk).values('strokes')[:1]
+    holes = (Hole.objects.filter(course_id=round.course_id)
+        .order_by('number')
+        .annotate(yards=Subquery(yards), strokes=Subquery(strokes))
+        .values_list('pk', 'number', 'name', 'yards', 'mens_par', 'womens_par', 'strokes'))
+    return RoundScorecard(round, [RoundScorecardRow(*values) for values in holes])
+
+
+def _ids(ids):
+    return ids if hasattr(ids, 'query') else {pk for pk in ids if pk is not None}
+
+
+# Bumps the layout version of the given courses (a list or a queryset of course ids), or of every course when course_ids is None
+def expire_course_scorecards(course_ids=None):
+    courses = Course.objects.all()
+    if course_ids is not None:
+        courses = courses.filter(pk__in=_ids(course_ids))
+    courses.update(scorecard_version=F('scorecard_version') + 1, updated_at=timezone.now())
+
+
+# Bumps the statistics version of the courses of the given holes, or of every course when hole_ids is None
+def expire_hole_stats(hole_ids=None):
+    courses = Course.objects.all()
+    if hole_ids is not None:
+        courses = courses.filter(pk__in=Hole.objects.filter(pk__in=_ids(hole_ids)).values('course_id'))
+    courses.update(stats_version=F('stats_version') + 1, updated_at=timezone.now())
+
+
+def expire_round_scorecards(round_ids):
+    Round.objects.filter(pk__in=_ids(round_ids)).update(scorecard_version=F('scorecard_version') + 1, updated_at=timezone.now())
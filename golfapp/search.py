@@ -0,0 +1,90 @@
+import re
+
+from django.db import connections, router
+from django.db.models import Q
+
+from .models import Course
+
+# Course search uses an SQLite FTS5 index over the course name, city and state.
+# golfapp_course_fts is an external content table that reads its text from golfapp_course, triggers on golfapp_course keep it in sync
+# with every insert, update and delete, including bulk writes that don't send model signals.
+# Databases without FTS5 fall back to prefix matching with LIKE.
+
+FTS_TABLE = 'golfapp_course_fts'
+
+FTS_SQL = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS golfapp_course_fts USING fts5("
+    "name, city, state, content='golfapp_course', content_rowid='id', tokenize='unicode61 remove_diacritics 2', prefix='2 3')",
+    "CREATE TRIGGER IF NOT EXISTS golfapp_course_fts_insert AFTER INSERT ON golfapp_course BEGIN "
+    "INSERT INTO golfapp_course_fts(rowid, name, city, state) VALUES (new.id, new.name, new.city, new.state); END",
+    "CREATE TRIGGER IF NOT EXISTS golfapp_course_fts_delete AFTER DELETE ON golfapp_course BEGIN "
+    "INSERT INTO golfapp_course_fts(golfapp_course_fts, rowid, name, city, state) VALUES ('delete', old.id, old.name, old.city, old.state); END",
+    "CREATE TRIGGER IF NOT EXISTS golfapp_course_fts_update AFTER UPDATE OF name, city, state ON golfapp_course BEGIN "
+    "INSERT INTO golfapp_course_fts(golfapp_course_fts, rowid, name, city, state) VALUES ('delete', old.id, old.name, old.city, old.state); "
+    "INSERT INTO golfapp_course_fts(rowid, name, city, state) VALUES (new.id, new.name, new.city, new.state); END",
+]
+
+# Name matches count for more than city matches, city more than state
+RANK = 'bm25(golfapp_course_fts, 10.0, 2.0, 1.0)'
+
+
+def fts_supported(connection):
+    if connection.vendor != 'sqlite':
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute('PRAGMA compile_options')
+        return 'ENABLE_FTS5' in {row[0] for row in cursor.fetchall()}
+
+
+# Creates the search table and its triggers if they are missing and fills the index from the existing courses.
+# SQLite drops the triggers whenever a migration rebuilds golfapp_course, so this also runs after every migrate
+def install_course_search(connection):
+    if not fts_supported(connection):
+        return False
+    names = [FTS_TABLE] + [FTS_TABLE + '_' + trigger for trigger in ('insert', 'delete', 'update')]
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT COUNT(*) FROM sqlite_master WHERE name IN (%s, %s, %s, %s)', names)
+        missing = cursor.fetchone()[0] < len(names)
+        for sql in FTS_SQL:
+            cursor.execute(sql)
+        # Rows written while a trigger was missing never reached the index
+        if missing:
+            cursor.execute("INSERT INTO golfapp_course_fts(golfapp_course_fts) VALUES ('rebuild')")
+    return True
+
+
+def uninstall_course_search(connection):
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        for trigger in ('insert', 'delete', 'update'):
+            cursor.execute('DROP TRIGGER IF EXISTS golfapp_course_fts_' + trigger)
+        cursor.execute('DROP TABLE IF EXISTS golfapp_course_fts')
+
+
+def _search_table_exists(connection):
+    if not hasattr(connection, '_course_search_installed'):
+        connection._course_search_installed = connection.vendor == 'sqlite' and FTS_TABLE in connection.introspection.table_names()
+    return connection._course_search_installed
+
+
+# Courses matching every word of the query as a prefix of a word in the name, city or state, best matches first
+def search_courses(query, limit=20, offset=0):
+    terms = re.findall(r'\w+', query)
+    if not terms:
+        return []
+    connection = connections[router.db_for_read(Course)]
+    if not _search_table_exists(connection):
+        courses = Course.objects.all()
+        for term in terms:
+            courses = courses.filter(Q(name__istartswith=term) | Q(city__istartswith=term) | Q(state__istartswith=term))
+        return list(courses.order_by('name', 'id')[offset:offset + limit])
+
+    match = ' '.join('"%s"*' % term for term in terms)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT rowid FROM golfapp_course_fts WHERE golfapp_course_fts MATCH %s ORDER BY ' + RANK + ' LIMIT %s OFFSET %s',
+            [match, limit, offset])
+        ids = [row[0] for row in cursor.fetchall()]
+    courses = Course.objects.using(connection.alias).in_bulk(ids)
+    return [courses[pk] for pk in ids if pk in courses]
@@ -0,0 +1,280 @@
+from django.db import connections, router, transaction
+from django.db.models import F
+from django.db.migrations.recorder import MigrationRecorder
+from django.db.models.signals import pre_save, post_save, pre_delete, post_delete, post_migrate, m2m_changed
+from django.dispatch import receiver
+
+from .handicaps import record_round_change as record_handicap_change
+from .images import delete_variants
+from .leaderboards import record_round_change as record_leaderboard_change
+from .models import Course, CoursePicture, GolferUser, Hole, Round, Score, StoredFile, Tee, TeeColor
+from .scorecards import expire_course_scorecards, expire_round_scorecards
+from .search import install_course_search
+from .statistics import rebuild_hole_stats, record_hole_scores, record_round_change
+from .totals import ScoreChange, apply_score_changes, rebuild_round_totals, round_totals_changed
+
+# Signal handlers that keep the stored round totals and hole statistics in step with Score, Hole and GolferUser changes,
+# bump the versions the cached scorecards are keyed on, and count the course pictures using each stored file.
+# pre_save handlers remember the row as it is in the database so post_save can work out what changed.
+
+
+@receiver(pre_save, sender=Score)
+def remember_score(sender, instance, raw=False, **kwargs):
+    instance._previous_score = None
+    if instance.pk and not raw:
+        instance._previous_score = Score.objects.filter(pk=instance.pk).values_list('round_id', 'hole_id', 'strokes').first()
+
+
+@receiver(post_save, sender=Score)
+def score_saved(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    previous = getattr(instance, '_previous_score', None)
+    current = (instance.round_id, instance.hole_id, instance.strokes)
+    if previous == current:
+        return
+    changes = [ScoreChange(*current, 1)]
+    if previous:
+        changes.append(ScoreChange(*previous, -1))
+    apply_score_changes(changes)
+    record_hole_scores(changes)
+    expire_round_scorecards([change.round_id for change in changes])
+
+
+@receiver(post_delete, sender=Score)
+def score_deleted(sender, instance, **kwargs):
+    changes = [ScoreChange(instance.round_id, instance.hole_id, instance.strokes, -1)]
+    apply_score_changes(changes)
+    record_hole_scores(changes)
+    expire_round_scorecards([instance.round_id])
+
+
+@receiver(pre_save, sender=Hole)
+def remember_hole_par(sender, instance, raw=False, **kwargs):
+    instance._previous_par = None
+    instance._previous_course = None
+    if instance.pk and not raw:
+        previous = Hole.objects.filter(pk=instance.pk).values_list('mens_par', 'womens_par', 'course_id').first()
+        if previous:
+            instance._previous_par, instance._previous_course = previous[:2], previous[2]
+
+
+# A round is completed once every hole of its course has a score, so adding a hole to a course (or moving one to another course)
+# can reopen its rounds. Otherwise only the rounds that have a score on the hole need their par totals refreshed
+@receiver(post_save, sender=Hole)
+def hole_saved(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    rounds = set()
+    previous_course = getattr(instance, '_previous_course', None)
+    if created or previous_course != instance.course_id:
+        courses = {instance.course_id, previous_course} - {None}
+        rounds.update(Round.objects.filter(course_id__in=courses).values_list('pk', flat=True))
+    previous = getattr(instance, '_previous_par', None)
+    if previous is not None and previous != (instance.mens_par, instance.womens_par):
+        rounds.update(Score.objects.filter(hole_id=instance.pk).values_list('round_id', flat=True))
+        rebuild_hole_stats([instance.pk])
+    if rounds:
+        rebuild_round_totals(rounds)
+
+
+# Deleting a hole sets the hole of its scores to NULL without sending Score signals, and can complete the rounds of its course
+# that had every other hole scored. The rounds with a score on the hole are remembered before the delete, and they and the course's
+# rounds are rebuilt after it. The hole's statistics are deleted along with it
+@receiver(pre_delete, sender=Hole)
+def remember_hole_rounds(sender, instance, **kwargs):
+    instance._scored_rounds = set(Score.objects.filter(hole_id=instance.pk).values_list('round_id', flat=True))
+
+
+@receiver(post_delete, sender=Hole)
+def hole_deleted(sender, instance, **kwargs):
+    rounds = getattr(instance, '_scored_rounds', set())
+    if instance.course_id:
+        rounds |= set(Round.objects.filter(course_id=instance.course_id).values_list('pk', flat=True))
+    rebuild_round_totals(rounds)
+
+
+# A hole moved to another course leaves the scorecards of both courses
+@receiver(post_save, sender=Hole)
+@receiver(post_delete, sender=Hole)
+def hole_changed(sender, instance, raw=False, **kwargs):
+    if not raw:
+        expire_course_scorecards([instance.course_id, getattr(instance, '_previous_course', None)])
+
+
+@receiver(pre_save, sender=Tee)
+def remember_tee_hole(sender, instance, raw=False, **kwargs):
+    instance._previous_hole = None
+    if instance.pk and not raw:
+        instance._previous_hole = Tee.objects.filter(pk=instance.pk).values_list('hole_id', flat=True).first()
+
+
+@receiver(post_save, sender=Tee)
+@receiver(post_delete, sender=Tee)
+def tee_changed(sender, instance, raw=False, **kwargs):
+    if not raw:
+        holes = {instance.hole_id, getattr(instance, '_previous_hole', None)} - {None}
+        expire_course_scorecards(Hole.objects.filter(pk__in=holes).values('course_id'))
+
+
+@receiver(post_save, sender=Course)
+def course_saved(sender, instance, raw=False, **kwargs):
+    if not raw:
+        expire_course_scorecards([instance.pk])
+
+
+# Tee colors are shared by every course, and the tees of a color are matched to it by name
+@receiver(post_save, sender=TeeColor)
+@receiver(post_delete, sender=TeeColor)
+def tee_color_changed(sender, instance, raw=False, **kwargs):
+    if not raw:
+        expire_course_scorecards()
+
+
+# Course forms save the course's tee colors after the course itself
+@receiver(m2m_changed, sender=Course.tee_colors.through)
+def course_colors_changed(sender, instance, action, reverse, **kwargs):
+    if action.startswith('post_'):
+        expire_course_scorecards(None if reverse else [instance.pk])
+
+
+# The (round, hole, strokes) of a round's scores
+def _round_scores(round_id):
+    return list(Score.objects.filter(round_id=round_id, hole__isnull=False).values_list('round_id', 'hole_id', 'strokes'))
+
+
+# Saving the stored totals sends round_totals_changed itself. Other round saves (RoundUpdate, the admin) can move the round
+# to another course, golfer or tee color, which rollups need to hear about too.
+# Moving to another golfer or tee color takes the round's scores out of the hole statistics here and puts them back in after the save
+@receiver(pre_save, sender=Round)
+def remember_round(sender, instance, raw=False, update_fields=None, **kwargs):
+    instance._previous_summary = None
+    instance._moved_scores = None
+    if raw or not instance.pk:
+        return
+    if update_fields is not None and set(update_fields) <= set(Round.TOTAL_FIELDS):
+        return
+    previous = Round.objects.filter(pk=instance.pk).first()
+    instance._previous_summary = previous.summary() if previous else None
+    if previous and (previous.created_by_id, previous.tee_color_id) != (instance.created_by_id, instance.tee_color_id):
+        instance._moved_scores = _round_scores(instance.pk)
+        record_hole_scores([ScoreChange(*score, -1) for score in instance._moved_scores])
+
+
+@receiver(post_save, sender=Round)
+def round_saved(sender, instance, raw=False, **kwargs):
+    previous = getattr(instance, '_previous_summary', None)
+    if raw or previous is None:
+        return
+    if getattr(instance, '_moved_scores', None):
+        record_hole_scores([ScoreChange(*score, 1) for score in instance._moved_scores])
+    current = instance.summary()
+    if current != previous:
+        round_totals_changed.send(sender=Round, previous=previous, current=current)
+
+
+# The instance being deleted may have been loaded before its totals last changed, so the summary is read from the database.
+# Its scores are kept with their round set to NULL, so they are taken out of the hole statistics while the round still exists
+@receiver(pre_delete, sender=Round)
+def remember_deleted_round(sender, instance, **kwargs):
+    previous = Round.objects.filter(pk=instance.pk).first()
+    instance._previous_summary = previous.summary() if previous else None
+    record_hole_scores([ScoreChange(*score, -1) for score in _round_scores(instance.pk)])
+
+
+@receiver(post_delete, sender=Round)
+def round_deleted(sender, instance, **kwargs):
+    previous = getattr(instance, '_previous_summary', None)
+    if previous:
+        round_totals_changed.send(sender=Round, previous=previous, current=None)
+
+
+@receiver(pre_save, sender=GolferUser)
+def remember_gender(sender, instance, raw=False, update_fields=None, **kwargs):
+    instance._previous_gender = None
+    if update_fields is not None and 'gender' not in update_fields:
+        return # Logins only save last_login
+    if instance.pk and not raw:
+        instance._previous_gender = GolferUser.objects.filter(pk=instance.pk).values_list('gender', flat=True).first()
+
+
+# The over/under par of every round and of each score in the hole statistics depends on the golfer's gender
+@receiver(post_save, sender=GolferUser)
+def gender_saved(sender, instance, created, raw=False, **kwargs):
+    previous = getattr(instance, '_previous_gender', None)
+    if raw or created or previous is None or previous == instance.gender:
+        return
+    rebuild_round_totals(instance.round_set.values_list('pk', flat=True))
+    rebuild_hole_stats(Score.objects.filter(round__created_by=instance).values('hole_id'))
+
+
+def _add_file_reference(name):
+    stored, created = StoredFile.objects.get_or_create(name=name)
+    StoredFile.objects.filter(pk=stored.pk).update(references=F('references') + 1)
+
+
+# Files only get deleted once the transaction commits, and not if another picture took the file up again in the meantime.
+# Files stored before reference counting have no StoredFile and are left alone
+def _remove_file_reference(storage, name):
+    StoredFile.objects.filter(name=name).update(references=F('references') - 1)
+    if StoredFile.objects.filter(name=name, references__lte=0).delete()[0]:
+        transaction.on_commit(lambda: _delete_unused_file(storage, name))
+
+
+def _delete_unused_file(storage, name):
+    if not StoredFile.objects.filter(name=name).exists():
+        storage.delete(name)
+        delete_variants(storage, name)
+
+
+@receiver(pre_save, sender=CoursePicture)
+def remember_picture_file(sender, instance, raw=False, **kwargs):
+    instance._previous_file = None
+    if instance.pk and not raw:
+        instance._previous_file = CoursePicture.objects.filter(pk=instance.pk).values_list('picture', flat=True).first()
+
+
+# Duplicate uploads share one stored file, so files are counted by the pictures using them rather than deleted with a picture
+@receiver(post_save, sender=CoursePicture)
+def picture_saved(sender, instance, raw=False, **kwargs):
+    previous = getattr(instance, '_previous_file', None)
+    current = instance.picture.name or None
+    if raw or previous == current:
+        return
+    if current:
+        _add_file_reference(current)
+    if previous:
+        _remove_file_reference(instance.picture.storage, previous)
+
+
+@receiver(post_delete, sender=CoursePicture)
+def picture_deleted(sender, instance, **kwargs):
+    if instance.picture.name:
+        _remove_file_reference(instance.picture.storage, instance.picture.name)
+
+
+# SQLite drops the course search triggers when a migration rebuilds the course table, put them back after every migrate
+@receiver(post_migrate)
+def restore_course_search(sender, app_config=None, using='default', **kwargs):
+    if app_config is None or app_config.label != 'golfapp':
+        return
+    if not router.allow_migrate_model(using, Course):
+        return # Read replicas get the search table with the copy of the database
+    connection = connections[using]
+    if ('golfapp', '0025_course_search') in MigrationRecorder(connection).applied_migrations():
+        install_course_search(connection)
+
+
+@receiver(round_totals_changed)
+def update_golfer_stats(sender, previous, current, **kwargs):
+    record_round_change(previous, current)
+
+
+@receiver(round_totals_changed)
+def update_handicap(sender, previous, current, **kwargs):
+    record_handicap_change(previous, current)
+
+
+@receiver(round_totals_changed)
+def update_leaderboards(sender, previous, current, **kwargs):
+    record_leaderboard_change(previous, current)
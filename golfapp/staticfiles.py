@@ -0,0 +1,40 @@
+import gzip
+import os
+
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+
+try:
+    import brotli
+except ImportError: # Optional, only gzip copies are written without it
+    brotli = None
+
+# collectstatic storage that fingerprints every file with the hash of its content (golfapp.3f2a9c1b7d4e.css) through the manifest,
+# then writes gzip and brotli copies of the text files next to the hashed names so they can be sent without compressing per request.
+# golfapp.media.StaticFile picks the copy matching the client's Accept-Encoding and marks hashed names as immutable.
+
+COMPRESSIBLE = ('.css', '.js', '.svg', '.txt', '.json', '.map', '.ttf', '.eot')
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    def post_process(self, paths, dry_run=False, **options):
+        yield from super().post_process(paths, dry_run, **options)
+        if dry_run:
+            return
+        for name in sorted(set(self.hashed_files.values())):
+            if name.endswith(COMPRESSIBLE) and self.exists(name):
+                self.compress(name)
+
+    # Compressed copies that aren't smaller than the file are left out
+    def compress(self, name):
+        with self.open(name) as original:
+            content = original.read()
+        copies = [('.gz', gzip.compress(content, compresslevel=9))]
+        if brotli is not None:
+            copies.append(('.br', brotli.compress(content)))
+        for extension, compressed in copies:
+            path = self.path(name + extension)
+            if len(compressed) < len(content):
+                with open(path, 'wb') as output:
+                    output.write(compressed)
+            elif os.path.exists(path):
+                os.remove(path)
@@ -0,0 +1,126 @@
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import Count
+
+from .models import GolferCourseStats, Hole, HoleStats, Round, Score
+from .scorecards import expire_hole_stats
+
+# Per golfer, per course statistics over completed rounds (best, worst, mean, median and the distribution of totals).
+# record_round_change moves one round in or out of a golfer's distribution when its totals change,
+# rebuild_golfer_stats recomputes every distribution with one grouped query.
+# Per hole statistics over every score work the same way: record_hole_scores applies score changes, rebuild_hole_stats recomputes them.
+
+
+# The (golfer, course, total strokes) a round summary counts as, or None if the round doesn't count
+def _contribution(summary):
+    if not summary or summary['completed_on'] is None or not summary['created_by_id'] or not summary['course_id']:
+        return None
+    return (summary['created_by_id'], summary['course_id'], summary['total_strokes'])
+
+
+def record_round_change(previous, current):
+    removed, added = _contribution(previous), _contribution(current)
+    if removed == added:
+        return
+    with transaction.atomic():
+        for contribution, rounds in ((removed, -1), (added, 1)):
+            if contribution is None:
+                continue
+            golfer_id, course_id, strokes = contribution
+            stats, created = GolferCourseStats.objects.select_for_update().get_or_create(golfer_id=golfer_id, course_id=course_id)
+            distribution = stats.get_distribution()
+            distribution[strokes] = distribution.get(strokes, 0) + rounds
+            stats.set_distribution(distribution)
+            if stats.rounds:
+                stats.save()
+            else:
+                stats.delete()
+
+
+# Counts completed rounds grouped by golfer, course and total in the database and writes the distributions in bulk
+def rebuild_golfer_stats(batch_size=500):
+    distributions = defaultdict(dict)
+    totals = (Round.objects.filter(completed_on__isnull=False, created_by__isnull=False, course__isnull=False)
+        .order_by()
+        .values('created_by_id', 'course_id', 'total_strokes')
+        .annotate(rounds=Count('pk')))
+    for row in totals.iterator():
+        distributions[(row['created_by_id'], row['course_id'])][row['total_strokes']] = row['rounds']
+
+    stats = []
+    for (golfer_id, course_id), distribution in distributions.items():
+        row = GolferCourseStats(golfer_id=golfer_id, course_id=course_id)
+        row.set_distribution(distribution)
+        stats.append(row)
+    with transaction.atomic():
+        GolferCourseStats.objects.all().delete()
+        GolferCourseStats.objects.bulk_create(stats, batch_size=batch_size)
+    return len(stats)
+
+
+# The keys of the HoleStats rows a score counts towards: the hole over all tees and the hole from the round's tees
+def _hole_keys(hole_id, tee_color_id):
+    return {(hole_id, None), (hole_id, tee_color_id)}
+
+
+# Applies ScoreChanges from totals to the hole statistics. The rounds and holes are read in one query each
+def record_hole_scores(changes):
+    changes = [change for change in changes if change.round_id and change.hole_id]
+    if not changes:
+        return
+    rounds = {row[0]: row[1:] for row in Round.objects.filter(pk__in={change.round_id for change in changes})
+        .values_list('pk', 'tee_color_id', 'created_by__gender')}
+    holes = {row[0]: row[1:] for row in Hole.objects.filter(pk__in={change.hole_id for change in changes})
+        .values_list('pk', 'mens_par', 'womens_par')}
+    updates = defaultdict(list)
+    for change in changes:
+        if change.round_id not in rounds or change.hole_id not in holes:
+            continue
+        tee_color_id, gender = rounds[change.round_id]
+        mens_par, womens_par = holes[change.hole_id]
+        to_par = change.strokes - (mens_par if gender == 'MALE' else womens_par)
+        for key in _hole_keys(change.hole_id, tee_color_id):
+            updates[key].append((change.strokes, to_par, change.sign))
+    if not updates:
+        return
+
+    with transaction.atomic():
+        rows = HoleStats.objects.select_for_update().filter(hole_id__in={hole_id for hole_id, tee_color_id in updates})
+        rows = {(row.hole_id, row.tee_color_id): row for row in rows}
+        for (hole_id, tee_color_id), scores in updates.items():
+            row = rows.get((hole_id, tee_color_id)) or HoleStats(hole_id=hole_id, tee_color_id=tee_color_id)
+            for strokes, to_par, count in scores:
+                row.add_scores(strokes, to_par, count)
+            if row.scores > 0:
+                row.save()
+            elif row.pk:
+                row.delete()
+        expire_hole_stats({hole_id for hole_id, tee_color_id in updates})
+
+
+# Recomputes the statistics of the given holes (a list or a queryset of hole ids), or of every hole when hole_ids is None,
+# from one grouped query over the scores
+def rebuild_hole_stats(hole_ids=None, batch_size=500):
+    scores = Score.objects.filter(round__isnull=False, hole__isnull=False)
+    if hole_ids is not None:
+        scores = scores.filter(hole_id__in=hole_ids)
+    grouped = (scores.order_by()
+        .values('hole_id', 'round__tee_color_id', 'round__created_by__gender', 'hole__mens_par', 'hole__womens_par', 'strokes')
+        .annotate(scores=Count('pk')))
+    stats = {}
+    for row in grouped.iterator():
+        par = row['hole__mens_par'] if row['round__created_by__gender'] == 'MALE' else row['hole__womens_par']
+        for hole_id, tee_color_id in _hole_keys(row['hole_id'], row['round__tee_color_id']):
+            if (hole_id, tee_color_id) not in stats:
+                stats[(hole_id, tee_color_id)] = HoleStats(hole_id=hole_id, tee_color_id=tee_color_id)
+            stats[(hole_id, tee_color_id)].add_scores(row['strokes'], row['strokes'] - par, row['scores'])
+
+    with transaction.atomic():
+        existing = HoleStats.objects.all()
+        if hole_ids is not None:
+            existing = existing.filter(hole_id__in=hole_ids)
+        existing.delete()
+        HoleStats.objects.bulk_create(stats.values(), batch_size=batch_size)
+        expire_hole_stats(hole_ids)
+    return len(stats)
@@ -0,0 +1,76 @@
+import hashlib
+import os
+
+from django.core.files.base import File
+from django.core.files.storage import FileSystemStorage
+from django.core.files.uploadhandler import MemoryFileUploadHandler, TemporaryFileUploadHandler
+from django.utils.deconstruct import deconstructible
+
+# Course pictures are stored under the SHA-256 of their content, so uploading the same picture again reuses the stored file
+# instead of writing a suffixed copy. The hash is worked out by the upload handlers as the request body streams in,
+# storage only reads a file to hash it when it didn't come through them (the admin shell, management commands).
+# Hashed names never point at different content, so they can be served with far future, immutable cache headers.
+# StoredFile counts the pictures using each file, the CoursePicture signals delete a file when its last picture goes.
+
+
+class HashingUploadHandlerMixin:
+    # The memory handler stops the handlers after it by raising from new_file, so the hash is set up first
+    def new_file(self, *args, **kwargs):
+        self.content_hash = hashlib.sha256()
+        super().new_file(*args, **kwargs)
+
+    def receive_data_chunk(self, raw_data, start):
+        self.content_hash.update(raw_data)
+        return super().receive_data_chunk(raw_data, start)
+
+    def file_complete(self, file_size):
+        file = super().file_complete(file_size)
+        if file is not None:
+            file.content_hash = self.content_hash.hexdigest()
+        return file
+
+
+class HashingMemoryFileUploadHandler(HashingUploadHandlerMixin, MemoryFileUploadHandler):
+    pass
+
+
+class HashingTemporaryFileUploadHandler(HashingUploadHandlerMixin, TemporaryFileUploadHandler):
+    pass
+
+
+def content_hash(content):
+    if getattr(content, 'content_hash', None):
+        return content.content_hash
+    digest = hashlib.sha256()
+    for chunk in content.chunks():
+        digest.update(chunk)
+    content.seek(0)
+    return digest.hexdigest()
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    # uploads/course/photo.JPG -> uploads/course/ab/ab12...ef.jpg, the two character folders keep directories small
+    def hashed_name(self, name, digest):
+        directory, filename = os.path.split(name)
+        extension = os.path.splitext(filename)[1].lower()
+        return os.path.join(directory, digest[:2], digest + extension).replace('\\', '/')
+
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+        name = self.hashed_name(name, content_hash(content))
+        if self.exists(name):
+            return name
+        return self._save(name, content)
+
+    # Saves under exactly the given name, for files named after a stored original (picture variants) rather than their own content
+    def save_named(self, name, content):
+        if self.exists(name):
+            self.delete(name)
+        return super().save(name, content)
+
+
+picture_storage = ContentAddressedStorage()
@@ -1,3 +1,717 @@
-from django.test import TestCase
+import io
+import json
+import os
+import tempfile
+from datetime import timedelta
+from decimal import Decimal
+from unittest import mock, skipUnless
+
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from .exports import COLUMNS as EXPORT_COLUMNS
+from .importer import import_courses
+from .leaderboards import TOP_N, leaderboard, prune_leaderboards, refill_board
+from .models import Course, CoursePicture, CourseRating, GolferCourseStats, GolferUser, HandicapIndex, Hole, HoleStats, LeaderboardEntry, Round, Score, ScoreDifferential, StoredFile, Tee, TeeColor
+from .pagination import decode_cursor, paginate_keyset
+from .routers import STICKY_COOKIE, ReplicaMiddleware, ReplicaRouter
+from .search import fts_supported, search_courses
+from .statistics import rebuild_hole_stats
+from .totals import rebuild_round_totals
+from .views import RoundFeed
 
 # Create your tests here.
+
+
+# A golfer and a three hole course shared by the tests, with helpers to add more courses and rounds
+class GolfTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.golfer = GolferUser.objects.create_user('golfer', 'golfer@example.com', 'password', gender='MALE')
+        cls.course = cls.create_course('Course')
+        cls.holes = list(cls.course.holes.order_by('number'))
+
+    # A course with holes numbered from 1, each with a tee of every color
+    @staticmethod
+    def create_course(name, holes=3, colors=('WHITE',)):
+        course = Course.objects.create(name=name, city='Town', state='ST')
+        for color in colors:
+            course.tee_colors.add(TeeColor.objects.create(color=color))
+        for number in range(1, holes + 1):
+            hole = Hole.objects.create(course=course, number=number, mens_par=4, womens_par=5)
+            for color in colors:
+                Tee.objects.create(hole=hole, color=color, yards=300 + number)
+        return course
+
+    # A round with a score for each of strokes on the course's holes in number order
+    @classmethod
+    def create_round(cls, strokes=(), course=None, golfer=None, **fields):
+        course = course or cls.course
+        round = Round.objects.create(course=course, created_by=golfer or cls.golfer, tee_color=course.tee_colors.first(), **fields)
+        for hole, value in zip(course.holes.order_by('number'), strokes):
+            Score.objects.create(round=round, hole=hole, strokes=value)
+        return round
+
+    # The stored totals of a round next to the totals rebuild_round_totals works out from its scores
+    def round_totals(self, round_id):
+        stored = Round.objects.filter(pk=round_id).values_list(*Round.TOTAL_FIELDS).get()
+        rebuild_round_totals([round_id])
+        return stored, Round.objects.filter(pk=round_id).values_list(*Round.TOTAL_FIELDS).get()
+
+    # Posts the course layout editor, holes is a dict of the values of each hole in the grid
+    def post_layout(self, holes):
+        data = {'holes-TOTAL_FORMS': len(holes), 'holes-INITIAL_FORMS': len([hole for hole in holes if hole.get('hole_id')])}
+        for index, hole in enumerate(holes):
+            values = dict({'name': '', 'mens_par': 4, 'womens_par': 5}, **hole)
+            data.update({'holes-%d-%s' % (index, name): value for name, value in values.items()})
+        return self.client.post(reverse('course_layout_update', args=[self.course.pk]), data)
+
+
+# Score signals apply each change to the stored totals as a delta, which must always end where a rebuild from the scores does
+class RoundTotalsTests(GolfTestCase):
+    def assertTotals(self, round, total_strokes, holes_played):
+        stored, rebuilt = self.round_totals(round.pk)
+        self.assertEqual(stored, rebuilt)
+        self.assertEqual(stored[:2], (total_strokes, holes_played))
+
+    def test_score_changes(self):
+        round = self.create_round([5, 5, 5])
+        self.assertTotals(round, 15, 3)
+        score = Score.objects.get(round=round, hole=self.holes[0])
+        score.strokes = 7
+        score.save()
+        self.assertTotals(round, 17, 3)
+        score = Score.objects.get(round=round, hole=self.holes[1])
+        score.hole = None
+        score.save()
+        self.assertTotals(round, 12, 2)
+        Score.objects.get(round=round, hole=self.holes[2]).delete()
+        self.assertTotals(round, 7, 1)
+
+    def test_par_change(self):
+        golfer = GolferUser.objects.create_user('golfer2', 'golfer2@example.com', 'password', gender='FEMALE')
+        round = self.create_round([7], golfer=golfer)
+        hole = Hole.objects.get(pk=self.holes[0].pk)
+        hole.womens_par = 6
+        hole.save()
+        round.refresh_from_db()
+        self.assertEqual((round.played_womens_par, round.to_par), (6, 1))
+        self.assertTotals(round, 7, 1)
+
+
+class RoundScoresUpdateTests(GolfTestCase):
+    def setUp(self):
+        self.client.force_login(self.golfer)
+        self.round = self.create_round()
+        self.url = reverse('round_scores_update', args=[self.round.pk])
+
+    def post(self, strokes):
+        data = {'scores-TOTAL_FORMS': len(self.holes), 'scores-INITIAL_FORMS': len(self.holes)}
+        for index, (hole, value) in enumerate(zip(self.holes, strokes)):
+            data['scores-%d-hole' % index] = hole.pk
+            data['scores-%d-strokes' % index] = '' if value is None else value
+        return self.client.post(self.url, data)
+
+    def scores(self):
+        return dict(Score.objects.filter(round=self.round).values_list('hole__number', 'strokes'))
+
+    def test_get_shows_every_hole(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.context['formset'].forms), len(self.holes))
+
+    def test_post_writes_scores_and_totals(self):
+        response = self.post([4, 5, None])
+        self.assertRedirects(response, reverse('round_detail', args=[self.round.pk]), fetch_redirect_response=False)
+        self.assertEqual(self.scores(), {1: 4, 2: 5})
+        stored, rebuilt = self.round_totals(self.round.pk)
+        self.assertEqual(stored, rebuilt)
+        self.assertEqual(stored[:2], (9, 2))
+
+        self.post([3, None, 6])
+        self.assertEqual(self.scores(), {1: 3, 3: 6})
+        stored, rebuilt = self.round_totals(self.round.pk)
+        self.assertEqual(stored, rebuilt)
+
+    def test_hole_from_another_course(self):
+        other = self.create_course('Other')
+        data = {'scores-TOTAL_FORMS': 1, 'scores-INITIAL_FORMS': 1, 'scores-0-hole': other.holes.first().pk, 'scores-0-strokes': 4}
+        response = self.client.post(self.url, data)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.scores(), {})
+
+
+class CourseLayoutUpdateTests(GolfTestCase):
+    def setUp(self):
+        self.client.force_login(self.golfer)
+
+    def test_swap_hole_numbers(self):
+        numbers = {self.holes[0].pk: 2, self.holes[1].pk: 1, self.holes[2].pk: 3}
+        response = self.post_layout([{'hole_id': hole.pk, 'number': numbers[hole.pk], 'yards_WHITE': 300 + hole.number} for hole in self.holes])
+        self.assertRedirects(response, reverse('course_detail', args=[self.course.pk]), fetch_redirect_response=False)
+        self.assertEqual(dict(self.course.holes.values_list('pk', 'number')), numbers)
+        # The tees stay on their holes
+        self.assertEqual(dict(Tee.objects.filter(hole__course=self.course).values_list('hole__number', 'yards')), {2: 301, 1: 302, 3: 303})
+
+    def test_duplicate_numbers_are_refused(self):
+        response = self.post_layout([{'hole_id': hole.pk, 'number': 1} for hole in self.holes])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(sorted(self.course.holes.values_list('number', flat=True)), [1, 2, 3])
+
+
+class KeysetPaginationTests(GolfTestCase):
+    # Five rounds, two of them on each of the first two days so the id has to break the ties
+    def setUp(self):
+        now = timezone.now()
+        rounds = [self.create_round(created_on=now - timedelta(days=number // 2)) for number in range(5)]
+        self.expected = [round.pk for round in sorted(rounds, key=lambda round: (round.created_on, round.pk), reverse=True)]
+
+    def test_pages_cover_every_round_once(self):
+        seen, cursor = [], None
+        while True:
+            page = paginate_keyset(Round.objects.all(), ['-created_on', '-id'], cursor, per_page=2)
+            self.assertLessEqual(len(page), 2)
+            seen += [round.pk for round in page]
+            if not page.has_next:
+                break
+            cursor = page.next_cursor
+        self.assertEqual(seen, self.expected)
+
+    def test_feed_follows_the_cursor(self):
+        self.client.force_login(self.golfer)
+        seen, url = [], reverse('round_feed')
+        with mock.patch.object(RoundFeed, 'paginate_by', 2):
+            while url:
+                data = self.client.get(url).json()
+                seen += [round['id'] for round in data['rounds']]
+                url = reverse('round_feed') + '?after=' + data['next'] if data['next'] else None
+        self.assertEqual(seen, self.expected)
+
+    def test_bad_cursor_shows_the_first_page(self):
+        self.assertIsNone(decode_cursor('not a cursor', 2))
+        self.assertIsNone(decode_cursor('WzFd', 2)) # [1], one value short
+        self.client.force_login(self.golfer)
+        data = self.client.get(reverse('round_feed') + '?after=garbage').json()
+        self.assertEqual([round['id'] for round in data['rounds']], self.expected)
+
+
+class CourseSearchTests(GolfTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.pine = Course.objects.create(name='Pine Valley', city='Clementon', state='NJ')
+        cls.pebble = Course.objects.create(name='Pebble Beach', city='Pebble Beach', state='CA')
+
+    def search(self, query):
+        return [course.pk for course in search_courses(query)]
+
+    @skipUnless(fts_supported(connection), 'SQLite was built without FTS5')
+    def test_full_text_match(self):
+        self.assertEqual(self.search('pine'), [self.pine.pk])
+        self.assertEqual(self.search('peb bea'), [self.pebble.pk])
+        self.assertEqual(self.search('clem'), [self.pine.pk]) # City
+        self.assertEqual(self.search('pine ca'), [])
+        self.assertEqual(self.search('***'), [])
+
+    @skipUnless(fts_supported(connection), 'SQLite was built without FTS5')
+    def test_index_follows_course_edits(self):
+        pine = Course.objects.get(pk=self.pine.pk)
+        pine.name = 'Cedar Ridge'
+        pine.save()
+        self.assertEqual(self.search('pine'), [])
+        self.assertEqual(self.search('cedar'), [self.pine.pk])
+        Course.objects.filter(pk=self.pebble.pk).update(city='Monterey') # No signals
+        self.assertEqual(self.search('monterey'), [self.pebble.pk])
+        Course.objects.get(pk=self.pebble.pk).delete()
+        self.assertEqual(self.search('monterey'), [])
+
+    def test_like_fallback(self):
+        with mock.patch('golfapp.search._search_table_exists', return_value=False):
+            self.assertEqual(self.search('p'), [self.pebble.pk, self.pine.pk]) # By name
+            self.assertEqual(self.search('pine nj'), [self.pine.pk])
+            self.assertEqual(self.search('clem'), [self.pine.pk]) # City
+            self.assertEqual(self.search('alley'), [])
+
+    def test_course_list_search(self):
+        response = self.client.get(reverse('course_list') + '?q=pine')
+        self.assertEqual([course.pk for course in response.context['course_list']], [self.pine.pk])
+
+
+# A round is completed once every hole of its course has a score, adding and deleting holes moves it in and out of the rollups
+class HoleChangeTests(GolfTestCase):
+    def setUp(self):
+        self.round = self.create_round([4, 4, 4])
+
+    def assertCompleted(self, completed):
+        stored, rebuilt = self.round_totals(self.round.pk)
+        self.assertEqual(stored, rebuilt)
+        self.assertEqual(stored[-1] is not None, completed) # completed_on
+        stats = GolferCourseStats.objects.filter(golfer=self.golfer, course=self.course).first()
+        self.assertEqual(stats.rounds if stats else 0, int(completed))
+        self.assertEqual(LeaderboardEntry.objects.filter(round=self.round).exists(), completed)
+
+    def test_adding_and_deleting_a_hole(self):
+        self.assertCompleted(True)
+        hole = Hole.objects.create(course=self.course, number=4, mens_par=4, womens_par=5)
+        self.assertCompleted(False)
+        hole.delete()
+        self.assertCompleted(True)
+
+    def test_moving_a_hole_to_another_course(self):
+        other = self.create_course('Other', holes=0)
+        hole = Hole.objects.create(course=other, number=4, mens_par=4, womens_par=5)
+        self.assertCompleted(True)
+        hole.course = self.course
+        hole.save()
+        self.assertCompleted(False)
+
+    def test_layout_editor_adding_a_hole(self):
+        self.client.force_login(self.golfer)
+        self.post_layout([{'hole_id': hole.pk, 'number': hole.number} for hole in self.holes] + [{'number': 4}])
+        self.assertEqual(self.course.holes.count(), 4)
+        self.assertCompleted(False)
+
+
+class HandicapTests(GolfTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        CourseRating.objects.create(course=cls.course, tee_color=cls.course.tee_colors.get(), course_rating=36, slope_rating=113)
+
+    def test_only_completed_rounds_count(self):
+        round = self.create_round([5, 5])
+        self.assertFalse(HandicapIndex.objects.exists())
+        Score.objects.create(round=round, hole=self.holes[2], strokes=5)
+        self.assertEqual(ScoreDifferential.objects.get(round=round).adjusted_gross_score, 15)
+        Score.objects.filter(round=round, hole=self.holes[2]).delete()
+        self.assertFalse(ScoreDifferential.objects.filter(round=round).exists())
+        self.assertEqual(HandicapIndex.objects.get(golfer=self.golfer).get_recent(), [])
+
+    def test_index_from_three_rounds(self):
+        for strokes in (4, 5, 6):
+            self.create_round([strokes] * 3)
+        # (113 / 113) x (12 - 36) - 2.0 from the lowest of 3 differentials
+        self.assertEqual(HandicapIndex.objects.get(golfer=self.golfer).index, Decimal('-26.0'))
+
+
+# The hole statistics are kept as deltas like the round totals, and must match a rebuild from the scores
+class HoleStatsTests(GolfTestCase):
+    def stats(self):
+        return sorted(HoleStats.objects.values_list('hole_id', 'tee_color_id', 'scores', 'strokes_sum', 'strokes_squares', 'distribution'),
+            key=lambda row: (row[0], row[1] or 0))
+
+    def assertRebuilt(self):
+        stats = self.stats()
+        rebuild_hole_stats()
+        self.assertEqual(stats, self.stats())
+
+    def test_score_and_round_changes(self):
+        round = self.create_round([3, 4, 6])
+        other = self.create_round([5])
+        self.assertEqual(HoleStats.objects.get(hole=self.holes[0], tee_color=None).get_distribution(), {-1: 1, 1: 1})
+        self.assertRebuilt()
+        Score.objects.filter(round=round, hole=self.holes[0]).update(strokes=4) # No signals, put right by the rebuild below
+        rebuild_hole_stats()
+        score = Score.objects.get(round=other, hole=self.holes[0])
+        score.strokes = 2
+        score.save()
+        self.assertRebuilt()
+        Score.objects.get(round=round, hole=self.holes[2]).delete()
+        self.assertRebuilt()
+        round.created_by = GolferUser.objects.create_user('golfer2', 'golfer2@example.com', 'password', gender='FEMALE')
+        round.save()
+        self.assertRebuilt()
+        hole = Hole.objects.get(pk=self.holes[1].pk)
+        hole.mens_par = 3
+        hole.save()
+        self.assertRebuilt()
+        self.assertEqual(HoleStats.objects.get(hole=self.holes[0], tee_color=None).get_distribution(), {-2: 1, -1: 1}) # 2 on par 4, 4 on par 5
+
+
+class LeaderboardTests(GolfTestCase):
+    def board(self, window='ALL'):
+        return [entry.round_id for entry in leaderboard(self.course.pk, window=window)]
+
+    def test_keeps_the_best_rounds(self):
+        rounds = [self.create_round([4, 4, strokes]) for strokes in range(1, TOP_N + 3)]
+        self.assertEqual(self.board(), [round.pk for round in rounds[:TOP_N]])
+        self.assertEqual(LeaderboardEntry.objects.filter(course=self.course, tee_color=None, window='ALL').count(), TOP_N)
+
+        # The best round gets worse and drops off, the next best round comes back on
+        score = Score.objects.get(round=rounds[0], hole=self.holes[2])
+        score.strokes = 50
+        score.save()
+        self.assertEqual(self.board(), [round.pk for round in rounds[1:TOP_N + 1]])
+        Round.objects.get(pk=rounds[1].pk).delete()
+        self.assertEqual(self.board(), [round.pk for round in rounds[2:TOP_N + 2]])
+
+    def test_board_that_is_not_full_is_not_refilled(self):
+        round = self.create_round([4, 4, 4])
+        self.create_round([5, 5, 5])
+        with mock.patch('golfapp.leaderboards.refill_board', wraps=refill_board) as refill:
+            score = Score.objects.get(round=round, hole=self.holes[0])
+            score.strokes = 6
+            score.save()
+            Round.objects.get(pk=round.pk).delete()
+        refill.assert_not_called()
+        self.assertEqual(len(self.board()), 1)
+
+    def test_window_rollover(self):
+        now = timezone.now()
+        old = self.create_round([5, 5, 5], created_on=now - timedelta(days=40))
+        recent = self.create_round([6, 6, 6], created_on=now - timedelta(days=25))
+        self.assertEqual(self.board('30D'), [recent.pk])
+        self.assertEqual(self.board(), [old.pk, recent.pk])
+        # Ten days on the recent round is past the window too
+        self.assertEqual(prune_leaderboards(now=now + timedelta(days=10)), 2) # Over all tees and for the white tees
+        self.assertFalse(LeaderboardEntry.objects.filter(window='30D').exists())
+        self.assertEqual(self.board(), [old.pk, recent.pk])
+
+
+# Points MEDIA_ROOT at an empty directory for the length of each test
+class TemporaryMediaMixin:
+    def setUp(self):
+        super().setUp()
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        media_settings = override_settings(MEDIA_ROOT=directory.name)
+        media_settings.enable()
+        self.addCleanup(media_settings.disable)
+        self.media_root = directory.name
+
+
+# Files are only deleted once the transaction commits, so these tests commit as they go
+class StoredFileTests(TemporaryMediaMixin, TransactionTestCase):
+    def setUp(self):
+        super().setUp()
+        self.course = GolfTestCase.create_course('Course', holes=0)
+
+    def upload(self, content, name='photo.JPG'):
+        return CoursePicture.objects.create(course=self.course, picture=SimpleUploadedFile(name, content))
+
+    def exists(self, name):
+        return os.path.exists(os.path.join(self.media_root, name))
+
+    def references(self, name):
+        return StoredFile.objects.filter(name=name).values_list('references', flat=True).first()
+
+    def test_duplicate_uploads_share_a_file(self):
+        first, second = self.upload(b'same picture'), self.upload(b'same picture', 'copy.jpg')
+        name = first.picture.name
+        self.assertEqual(second.picture.name, name)
+        self.assertRegex(name, r'^uploads/course/[0-9a-f]{2}/[0-9a-f]{64}\.jpg$')
+        self.assertEqual(self.references(name), 2)
+        self.assertEqual(len(os.listdir(os.path.dirname(os.path.join(self.media_root, name)))), 1)
+
+        first.delete()
+        self.assertEqual(self.references(name), 1)
+        self.assertTrue(self.exists(name))
+        second.delete()
+        self.assertIsNone(self.references(name))
+        self.assertFalse(self.exists(name))
+
+    def test_replacing_a_picture_releases_the_old_file(self):
+        picture = self.upload(b'first picture')
+        old = picture.picture.name
+        picture.picture = SimpleUploadedFile('photo.jpg', b'second picture')
+        picture.save()
+        self.assertNotEqual(picture.picture.name, old)
+        self.assertEqual(self.references(picture.picture.name), 1)
+        self.assertIsNone(self.references(old))
+        self.assertFalse(self.exists(old))
+
+
+class MediaFileTests(TemporaryMediaMixin, SimpleTestCase):
+    def setUp(self):
+        super().setUp()
+        with open(os.path.join(self.media_root, 'notes.txt'), 'wb') as file:
+            file.write(b'0123456789')
+        self.url = '/media/notes.txt'
+
+    def test_whole_file(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content), b'0123456789')
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+        self.assertEqual(response['Cache-Control'], 'public, max-age=86400')
+
+    def test_range(self):
+        response = self.client.get(self.url, HTTP_RANGE='bytes=2-5')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response['Content-Range'], 'bytes 2-5/10')
+        self.assertEqual(b''.join(response.streaming_content), b'2345')
+        response = self.client.get(self.url, HTTP_RANGE='bytes=-3')
+        self.assertEqual(b''.join(response.streaming_content), b'789')
+
+    def test_range_past_the_end(self):
+        response = self.client.get(self.url, HTTP_RANGE='bytes=20-')
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response['Content-Range'], 'bytes */10')
+
+    def test_stale_if_range_sends_the_whole_file(self):
+        response = self.client.get(self.url, HTTP_RANGE='bytes=2-5', HTTP_IF_RANGE='"stale"')
+        self.assertEqual(response.status_code, 200)
+
+    def test_not_modified(self):
+        etag = self.client.get(self.url)['ETag']
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+
+    def test_missing_file_and_path_outside_media(self):
+        self.assertEqual(self.client.get('/media/missing.txt').status_code, 404)
+        self.assertEqual(self.client.get('/media/../manage.py').status_code, 404)
+
+
+class ConditionalPageTests(GolfTestCase):
+    def setUp(self):
+        self.client.force_login(self.golfer)
+        self.round = self.create_round([4])
+
+    def test_round_page(self):
+        url = reverse('round_detail', args=[self.round.pk])
+        response = self.client.get(url)
+        etag = response['ETag']
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        Score.objects.create(round=self.round, hole=self.holes[1], strokes=5)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
+
+        # The page shows the course's holes as well
+        etag = response['ETag']
+        Tee.objects.filter(hole=self.holes[0]).get().save()
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_course_page(self):
+        url = reverse('course_detail', args=[self.course.pk])
+        etag = self.client.get(url)['ETag']
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        Hole.objects.create(course=self.course, number=4, mens_par=3, womens_par=3)
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_etag_covers_the_user(self):
+        url = reverse('round_detail', args=[self.round.pk])
+        etag = self.client.get(url)['ETag']
+        self.client.logout()
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_missing_page(self):
+        self.assertEqual(self.client.get(reverse('round_detail', args=[self.round.pk + 100])).status_code, 404)
+
+
+class ScorecardApiTests(GolfTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.courses = [cls.course] + [cls.create_course('Course %d' % number, colors=('WHITE', 'BLUE')) for number in range(3)]
+        cls.rounds = [cls.create_round([4, 5], course=course) for course in cls.courses]
+
+    def get(self, name, query=''):
+        return self.client.get(reverse(name) + query)
+
+    def test_courses_batch_in_constant_queries(self):
+        for courses in (self.courses[:1], self.courses):
+            with self.assertNumQueries(4):
+                response = self.get('api_courses', '?ids=' + ','.join(str(course.pk) for course in courses))
+            self.assertEqual([course['id'] for course in response.json()['courses']], [course.pk for course in courses])
+        data = response.json()
+        self.assertEqual(data['hole_fields'], ['id', 'number', 'name', 'mens_par', 'womens_par', 'yards'])
+        course = data['courses'][1]
+        self.assertEqual(course['tee_colors'], ['WHITE', 'BLUE'])
+        self.assertEqual(course['holes'][0][1:], [1, None, 4, 5, [301, 301]])
+
+    def test_rounds_batch_in_constant_queries(self):
+        for rounds in (self.rounds[:1], self.rounds):
+            with self.assertNumQueries(4):
+                response = self.get('api_rounds', '?ids=' + ','.join(str(round.pk) for round in rounds))
+            self.assertEqual([round['id'] for round in response.json()['rounds']], [round.pk for round in rounds])
+        round = response.json()['rounds'][0]
+        self.assertEqual((round['total_strokes'], round['holes_played'], round['to_par']), (9, 2, 1))
+        self.assertEqual(round['holes'], [[1, 4, 5, 301, 4], [2, 4, 5, 302, 5], [3, 4, 5, 303, None]])
+
+    def test_fields(self):
+        url = reverse('api_round', args=[self.rounds[0].pk])
+        data = self.client.get(url + '?fields=id,to_par,holes&hole_fields=number,strokes').json()
+        self.assertEqual(data, {'hole_fields': ['number', 'strokes'], 'rounds': [{'id': self.rounds[0].pk, 'to_par': 1,
+            'holes': [[1, 4], [2, 5], [3, None]]}]})
+        with self.assertNumQueries(1):
+            data = self.get('api_courses', '?ids=%d&fields=name' % self.course.pk).json()
+        self.assertEqual(data, {'courses': [{'name': 'Course'}]})
+
+    def test_bad_requests(self):
+        self.assertEqual(self.get('api_courses').status_code, 400)
+        self.assertEqual(self.get('api_courses', '?ids=1,x').status_code, 400)
+        self.assertEqual(self.get('api_courses', '?ids=' + ','.join(str(pk) for pk in range(1, 102))).status_code, 400)
+        response = self.get('api_rounds', '?ids=%d&fields=id,score' % self.rounds[0].pk)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json(), {'error': 'Unknown fields: score'})
+
+    def test_missing(self):
+        missing = self.rounds[-1].pk + 100
+        self.assertEqual(self.client.get(reverse('api_round', args=[missing])).status_code, 404)
+        self.assertEqual(self.get('api_rounds', '?ids=%d,%d' % (missing, self.rounds[0].pk)).json()['rounds'][0]['id'], self.rounds[0].pk)
+
+
+class ImportCoursesTests(GolfTestCase):
+    CSV = (
+        'name,city,state,number,hole_name,mens_par,womens_par,yards_WHITE,yards_BLUE\n'
+        'Pines,Town,ST,1,,4,5,350,380\n'
+        'Pines,Town,ST,2,Dogleg,5,5,480,\n'
+        'Oaks,Town,ST,1,,3,3,150,170\n'
+        'Oaks,Town,ST,x,,3,3,150,170\n'
+    )
+    NDJSON = ('{"name": "Pines", "city": "Town", "state": "ST", "holes": [{"number": 1, "name": null, "mens_par": %d, '
+        '"womens_par": 5, "yards": {"WHITE": 350, "BLUE": %d}}]}\n')
+
+    def import_courses(self, text, format):
+        result = import_courses(io.StringIO(text), format)
+        return result, (result.courses_created, result.holes_created, result.tees_created), (
+            result.courses_updated, result.holes_updated, result.tees_updated)
+
+    def layout(self):
+        return sorted(Tee.objects.filter(hole__course__city='Town', hole__course__state='ST').exclude(hole__course=self.course)
+            .values_list('hole__course__name', 'hole__number', 'hole__name', 'hole__mens_par', 'hole__womens_par', 'color', 'yards'))
+
+    def test_import_again_changes_nothing(self):
+        result, created, updated = self.import_courses(self.CSV, 'csv')
+        self.assertEqual((created, updated), ((2, 3, 5), (0, 0, 0)))
+        self.assertEqual(result.errors, [(5, 'number must be a whole number')])
+        layout = self.layout()
+        self.assertEqual(layout[0], ('Oaks', 1, None, 3, 3, 'BLUE', 170))
+        for text, format in ((self.CSV, 'csv'), (self.NDJSON % (4, 380), 'ndjson')):
+            result, created, updated = self.import_courses(text, format)
+            self.assertEqual((created, updated), ((0, 0, 0), (0, 0, 0)))
+        self.assertEqual(self.layout(), layout)
+
+    def test_updates(self):
+        self.import_courses(self.CSV, 'csv')
+        result, created, updated = self.import_courses(self.NDJSON % (3, 390), 'ndjson')
+        self.assertEqual((created, updated), ((0, 0, 0), (1, 1, 1)))
+        self.assertEqual(Tee.objects.get(hole__course__name='Pines', hole__number=1, color='BLUE').yards, 390)
+        self.assertEqual(Hole.objects.get(course__name='Pines', number=1).mens_par, 3)
+
+
+class RoundExportTests(GolfTestCase):
+    def test_holes_in_number_order(self):
+        round = self.create_round([4, 5, 6])
+        # Renumber the first two holes so hole ids and hole numbers disagree
+        first, second = (hole.pk for hole in self.holes[:2])
+        Hole.objects.filter(pk=first).update(number=99)
+        Hole.objects.filter(pk=second).update(number=1)
+        Hole.objects.filter(pk=first).update(number=2)
+        self.client.force_login(self.golfer)
+        response = self.client.get(reverse('round_export') + '?format=ndjson')
+        rows = [json.loads(line) for line in b''.join(response.streaming_content).decode().splitlines()]
+        self.assertEqual([(row['hole_number'], row['strokes']) for row in rows], [(1, 5), (2, 4), (3, 6)])
+        self.assertEqual({row['round_id'] for row in rows}, {round.pk})
+
+    def test_csv_header_and_login(self):
+        self.assertEqual(self.client.get(reverse('round_export')).status_code, 403)
+        self.client.force_login(self.golfer)
+        response = self.client.get(reverse('round_export') + '?format=csv')
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        self.assertEqual(b''.join(response.streaming_content).decode().splitlines(), [','.join(EXPORT_COLUMNS)])
+
+
+@override_settings(DATABASE_REPLICAS=['replica'], REPLICA_STICKY_SECONDS=10)
+class ReplicaRoutingTests(SimpleTestCase):
+    # Runs a request through ReplicaMiddleware and returns the response and the database a read during it went to
+    def request(self, method, cookie=None):
+        request = getattr(RequestFactory(), method)('/')
+        if cookie is not None:
+            request.COOKIES[STICKY_COOKIE] = cookie
+        databases = []
+        def get_response(request):
+            databases.append(ReplicaRouter().db_for_read(Round))
+            return HttpResponse()
+        return ReplicaMiddleware(get_response)(request), databases[0]
+
+    def test_reads_of_get_requests_go_to_a_replica(self):
+        response, database = self.request('get')
+        self.assertEqual(database, 'replica')
+        self.assertNotIn(STICKY_COOKIE, response.cookies)
+
+    def test_golfer_reads_the_primary_after_posting(self):
+        response, database = self.request('post')
+        self.assertEqual(database, 'default')
+        cookie = response.cookies[STICKY_COOKIE]
+        self.assertEqual(cookie['max-age'], 10)
+        self.assertEqual(self.request('get', cookie.value)[1], 'default')
+        self.assertEqual(self.request('get', '0')[1], 'replica')
+
+    def test_reads_outside_a_request_go_to_the_primary(self):
+        self.request('get')
+        self.assertEqual(ReplicaRouter().db_for_read(Round), 'default')
+
+
+# Runs EXPLAIN QUERY PLAN on every query the read pages make and fails when one reads a whole table or sorts into a temporary B-tree.
+# Queries on sqlite_master (schema lookups) and on the course search table (ranked by relevance, so always sorted) are left out
+@skipUnless(connection.vendor == 'sqlite', 'Query plans are checked on SQLite')
+class QueryPlanTests(GolfTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.courses = [cls.create_course('Course %d' % number, holes=9, colors=('WHITE', 'BLUE')) for number in range(3)]
+        cls.rounds = [cls.create_round([5] * 9, course=course) for course in cls.courses for _ in range(2)]
+        for course in cls.courses:
+            CoursePicture.objects.create(course=course, created_by=cls.golfer, picture='uploads/course/00/picture.jpg')
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.golfer)
+
+    def urls(self):
+        course, round = self.courses[0], self.rounds[0]
+        course_ids = ','.join(str(course.pk) for course in self.courses)
+        round_ids = ','.join(str(round.pk) for round in self.rounds)
+        return [
+            reverse('home'),
+            reverse('round_feed'),
+            reverse('golfer_stats'),
+            reverse('course_list'),
+            reverse('course_detail', args=[course.pk]),
+            reverse('coursepicture_list', args=[course.pk]),
+            reverse('course_leaderboard', args=[course.pk]),
+            reverse('course_leaderboard', args=[course.pk]) + '?window=30D&tee=%d' % round.tee_color_id,
+            reverse('round_detail', args=[round.pk]),
+            reverse('api_courses') + '?ids=' + course_ids,
+            reverse('api_rounds') + '?ids=' + round_ids,
+            reverse('round_export'),
+        ]
+
+    def query_plans(self, url):
+        queries = []
+
+        def record(execute, sql, params, many, context):
+            queries.append((sql, params))
+            return execute(sql, params, many, context)
+
+        with connection.execute_wrapper(record):
+            response = self.client.get(url)
+            if response.streaming:
+                b''.join(response.streaming_content)
+        self.assertEqual(response.status_code, 200, url)
+        with connection.cursor() as cursor:
+            for sql, params in queries:
+                if not sql.lstrip().upper().startswith('SELECT') or 'sqlite_master' in sql or 'golfapp_course_fts' in sql:
+                    continue
+                cursor.execute('EXPLAIN QUERY PLAN ' + sql, params)
+                yield sql, [row[-1] for row in cursor.fetchall()]
+
+    def test_pages_use_indexes(self):
+        for url in self.urls():
+            for sql, plan in self.query_plans(url):
+                with self.subTest(url=url, sql=sql):
+                    scans = [step for step in plan if step.startswith('SCAN') and ' USING ' not in step]
+                    self.assertEqual(scans, [], 'Full table scan')
+                    sorts = [step for step in plan if 'TEMP B-TREE' in step]
+                    self.assertEqual(sorts, [], 'Temporary B-tree sort')
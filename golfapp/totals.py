@@ -0,0 +1,117 @@
+from collections import defaultdict, namedtuple
+
+from django.db import transaction
+from django.db.models import Count, Sum
+from django.dispatch import Signal
+from django.utils import timezone
+
+from .models import Hole, Round, Score
+
+# Round totals (strokes, holes played, par of the holes played, over/under par and when the round was completed) are stored on the Round.
+# Score and Hole signals apply each change as a delta, rebuild_round_totals recomputes them from the scores.
+# Rollups built on top of the totals (golfer statistics) listen to round_totals_changed.
+
+# Sent after the stored totals of a round change, and when a round moves to another course, golfer or tee color or is deleted.
+# previous and current are the round's summary() from before and after the change, current is None when the round was deleted
+round_totals_changed = Signal(providing_args=['previous', 'current'])
+
+# A score being added to (sign=1) or removed from (sign=-1) a round
+ScoreChange = namedtuple('ScoreChange', ['round_id', 'hole_id', 'strokes', 'sign'])
+
+
+# Applies score changes to the stored totals of their rounds. Hole pars are read in one query and each round is written once
+def apply_score_changes(changes):
+    changes = [change for change in changes if change.round_id and change.hole_id]
+    if not changes:
+        return
+    holes = Hole.objects.in_bulk({change.hole_id for change in changes})
+    deltas = defaultdict(lambda: [0, 0, 0, 0])
+    for change in changes:
+        hole = holes.get(change.hole_id)
+        if hole is None:
+            continue
+        delta = deltas[change.round_id]
+        delta[0] += change.sign * change.strokes
+        delta[1] += change.sign
+        delta[2] += change.sign * hole.mens_par
+        delta[3] += change.sign * hole.womens_par
+
+    with transaction.atomic():
+        rounds = list(Round.objects.select_for_update().select_related('created_by').filter(pk__in=deltas))
+        hole_counts = _hole_counts({round.course_id for round in rounds})
+        for round in rounds:
+            previous = round.summary()
+            strokes, holes_played, mens_par, womens_par = deltas[round.pk]
+            round.total_strokes += strokes
+            round.holes_played += holes_played
+            round.played_mens_par += mens_par
+            round.played_womens_par += womens_par
+            round.set_to_par()
+            _set_completed(round, hole_counts)
+            if round.summary() != previous:
+                round.save(update_fields=Round.TOTAL_FIELDS)
+                round_totals_changed.send(sender=Round, previous=previous, current=round.summary())
+
+
+# Recomputes the stored totals from the scores, batch_size rounds at a time.
+# Rebuilds every round when round_ids is None. Returns the number of rounds whose totals changed
+def rebuild_round_totals(round_ids=None, batch_size=500):
+    changed = 0
+    for batch in _round_batches(round_ids, batch_size):
+        sums = {
+            row['round_id']: row for row in Score.objects
+                .filter(round_id__in=batch, hole__isnull=False)
+                .values('round_id')
+                .annotate(strokes=Sum('strokes'), holes=Count('pk'), mens_par=Sum('hole__mens_par'), womens_par=Sum('hole__womens_par'))
+        }
+        with transaction.atomic():
+            updated = []
+            rounds = list(Round.objects.select_for_update().select_related('created_by').filter(pk__in=batch))
+            hole_counts = _hole_counts({round.course_id for round in rounds})
+            for round in rounds:
+                previous = round.summary()
+                row = sums.get(round.pk, {})
+                round.total_strokes = row.get('strokes') or 0
+                round.holes_played = row.get('holes') or 0
+                round.played_mens_par = row.get('mens_par') or 0
+                round.played_womens_par = row.get('womens_par') or 0
+                round.set_to_par()
+                _set_completed(round, hole_counts)
+                if round.summary() != previous:
+                    round.updated_at = timezone.now() # bulk_update leaves auto_now fields alone
+                    updated.append((round, previous))
+            Round.objects.bulk_update([round for round, previous in updated], Round.TOTAL_FIELDS + ['updated_at'])
+            for round, previous in updated:
+                round_totals_changed.send(sender=Round, previous=previous, current=round.summary())
+        changed += len(updated)
+    return changed
+
+
+def _hole_counts(course_ids):
+    return dict(Hole.objects.filter(course_id__in=course_ids).values('course_id').annotate(holes=Count('pk')).values_list('course_id', 'holes'))
+
+
+# A round is completed when every hole of its course has a score. Taking a score away reopens the round
+def _set_completed(round, hole_counts):
+    holes = hole_counts.get(round.course_id, 0)
+    if holes and round.holes_played >= holes:
+        if round.completed_on is None:
+            round.completed_on = timezone.now()
+    else:
+        round.completed_on = None
+
+
+# Yields lists of round ids. Walks the whole table by primary key when no ids are given so memory stays flat
+def _round_batches(round_ids, batch_size):
+    if round_ids is not None:
+        round_ids = sorted(set(round_ids) - {None}) # Scores of deleted rounds are kept with no round
+        for start in range(0, len(round_ids), batch_size):
+            yield round_ids[start:start + batch_size]
+        return
+    last_pk = 0
+    while True:
+        batch = list(Round.objects.filter(pk__gt=last_pk).order_by('pk').values_list('pk', flat=True)[:batch_size])
+        if not batch:
+            return
+        yield batch
+        last_pk = batch[-1]
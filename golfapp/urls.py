@@ -1,26 +1,35 @@
-from django.urls import path
+import re
+
+from django.urls import path, re_path
 from django.conf.urls import url
 from django.conf import settings
-from django.conf.urls.static import static
 
-from .views import SignUpView, HomeView
-from .views import CourseList, CourseCreate, CourseDelete, CourseUpdate, CourseDetail, CoursePictureCreate, CoursePictureDetail, CoursePictureDelete
+from .api import CourseApi, RoundApi
+from .media import MediaFile, StaticFile
+from .views import SignUpView, HomeView, RoundFeed, RoundExport, GolferStats
+from .views import CourseList, CourseAutocomplete, CourseCreate, CourseDelete, CourseUpdate, CourseDetail, CourseLeaderboard, CourseLayoutUpdate, CoursePictureList, CoursePictureCreate, CoursePictureDetail, CoursePictureDelete
 from .views import TeeColorCreate
 from .views import HoleCreate, HoleDelete
 from .views import TeeCreate, TeeDelete, TeeUpdate
 from .views import RoundCreate, RoundDetail, RoundUpdate, RoundDelete
-from .views import ScoreCreate
+from .views import ScoreCreate, RoundScoresUpdate
 
 urlpatterns = [
     path('', HomeView.as_view(), name='home'),
+    path('rounds/feed', RoundFeed.as_view(), name='round_feed'),
+    path('rounds/export', RoundExport.as_view(), name='round_export'),
+    path('stats/', GolferStats.as_view(), name='golfer_stats'),
 
     path('signup/', SignUpView.as_view(), name='signup'),
 
     path('courses/', CourseList.as_view(), name='course_list'),
+    path('courses/autocomplete', CourseAutocomplete.as_view(), name='course_autocomplete'),
     path('course/create', CourseCreate.as_view(), name='course_create'),
     path('courses/delete/<int:pk>', CourseDelete.as_view(), name='course_delete'),
     path('courses/update/<int:pk>', CourseUpdate.as_view(), name='course_update'),
     path('course/<int:pk>', CourseDetail.as_view(), name='course_detail'),
+    path('course/<int:pk>/layout/', CourseLayoutUpdate.as_view(), name='course_layout_update'),
+    path('course/<int:pk>/leaderboard/', CourseLeaderboard.as_view(), name='course_leaderboard'),
 
     url(r'courses/(?P<course_pk>\w+)/teecolor/create', TeeColorCreate.as_view(), name='teecolor_create'),
 
@@ -37,9 +46,21 @@ urlpatterns = [
     path('rounds/delete/<int:pk>', RoundDelete.as_view(), name='round_delete'),
 
     url(r'round/(?P<round_pk>\w+)/hole/(?P<hole_pk>\w+)/score/create/', ScoreCreate.as_view(), name='score_create'),
+    path('round/<int:pk>/scores/', RoundScoresUpdate.as_view(), name='round_scores_update'),
 
+    path('course/<int:pk>/pictures/', CoursePictureList.as_view(), name='coursepicture_list'),
     url(r'courses/(?P<course_pk>\w+)/coursepicture/create', CoursePictureCreate.as_view(), name='coursepicture_create'),
     url(r'courses/(?P<course_pk>\w+)/coursepicture/(?P<pk>\w+)', CoursePictureDetail.as_view(), name='coursepicture_detail'),
     url(r'courses/(?P<course_pk>\w+)/coursepictures/delete/(?P<pk>\w+)', CoursePictureDelete.as_view(), name='coursepicture_delete'),
 
-] + static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
\ No newline at end of file
+    # Read only JSON scorecards, see api.py
+    path('api/courses', CourseApi.as_view(), name='api_courses'),
+    path('api/courses/<int:pk>', CourseApi.as_view(), name='api_course'),
+    path('api/rounds', RoundApi.as_view(), name='api_rounds'),
+    path('api/rounds/<int:pk>', RoundApi.as_view(), name='api_round'),
+
+    # Uploaded media with caching validators and range requests, see media.py
+    re_path(r'^%s(?P<path>.+)$' % re.escape(settings.MEDIA_URL.lstrip('/')), MediaFile.as_view(), name='media'),
+    # collectstatic output with precompressed copies, for deployments without a front proxy serving STATIC_ROOT
+    re_path(r'^%s(?P<path>.+)$' % re.escape(settings.STATIC_URL.lstrip('/')), StaticFile.as_view(), name='static'),
+]
\ No newline at end of file
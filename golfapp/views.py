@@ -1,28 +1,127 @@
-from django.shortcuts import render
-from django.urls import reverse_lazy
-from django.views.generic.base import TemplateView
-from django.views.generic.edit import CreateView
+import hashlib
+
+from django.http import JsonResponse, StreamingHttpResponse
+from django.shortcuts import render, get_object_or_404
+from django.urls import reverse, reverse_lazy
+from django.utils import timezone
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.functional import SimpleLazyObject
+from django.utils.http import http_date
+from django.views.generic.base import TemplateView, View
+from django.views.generic.edit import CreateView, FormView
 from django.views.generic import ListView, UpdateView, DeleteView, DetailView
 from datetime import datetime, time, date
 
-from django.db.models import Sum
+from django.db import IntegrityError, transaction
+from django.db.models import prefetch_related_objects
 
-from .forms import GolferUserCreationForm, HoleForm, TeeForm, TeeColorForm, ScoreForm, CoursePictureForm
-from .models import Course, TeeColor, Hole, Tee, Round, Score, CoursePicture
+
+from .forms import GolferUserCreationForm, HoleForm, TeeForm, TeeColorForm, ScoreForm, CoursePictureForm, ScoreEntryFormSet, HoleLayoutFormSet, RoundForm
+from .models import Course, TeeColor, Hole, Tee, Round, Score, CoursePicture, GolferCourseStats, HandicapIndex, LeaderboardEntry
+from .exports import FORMATS as EXPORT_FORMATS, export_rows
+from .images import schedule_variants
+from .leaderboards import WINDOWS, leaderboard
+from .pagination import paginate_keyset
+from .search import search_courses
+from .scorecards import build_course_scorecard, build_round_scorecard, expire_course_scorecards, expire_round_scorecards
+from .statistics import rebuild_hole_stats, record_hole_scores
+from .totals import ScoreChange, apply_score_changes, rebuild_round_totals
 
 
 # Create your views here.
 
+# Answers conditional GETs of a page from when what it shows last changed, the latest of the last_modified_fields of the page's
+# object read in one query before the view loads anything else. Pages show who is signed in, so the ETag covers the user as well
+class ConditionalPageMixin:
+    last_modified_fields = ['updated_at']
+
+    def get_last_modified(self):
+        values = self.model.objects.filter(pk=self.kwargs['pk']).values_list(*self.last_modified_fields).first()
+        return max((value for value in values if value), default=None) if values else None
+
+    def get(self, request, *args, **kwargs):
+        last_modified = self.get_last_modified()
+        if last_modified is None:
+            return super().get(request, *args, **kwargs)
+        etag = '"%s"' % hashlib.md5(('%s:%s' % (last_modified.isoformat(), request.user.pk)).encode()).hexdigest()
+        timestamp = int(last_modified.timestamp())
+        response = get_conditional_response(request, etag=etag, last_modified=timestamp)
+        if response is None:
+            response = super().get(request, *args, **kwargs)
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(timestamp)
+        patch_cache_control(response, no_cache=True)
+        patch_vary_headers(response, ['Cookie'])
+        return response
+
 # Round for logged in user are displayed on the home page 
+# Each round shows its stored totals so the list doesn't need to look at the scores
+# Rounds are paged with a cursor on (created_on, id) so an old page costs the same as the first one
 class HomeView(TemplateView):
     template_name = 'home.html'
+    paginate_by = 20
     
     def get_context_data(self, **kwargs):
         context = super(HomeView, self).get_context_data(**kwargs)
         if (self.request.user.is_active):
-            context['rounds'] = Round.objects.select_related().filter(created_by=self.request.user)
+            context['page'] = golfer_rounds_page(self.request.user, self.request.GET.get('after'), self.paginate_by)
+            context['rounds'] = context['page'].object_list
         return context 
 
+# The same list of rounds as JSON for loading more rounds onto the home page as the golfer scrolls
+class RoundFeed(View):
+    paginate_by = 20
+
+    def get(self, request, *args, **kwargs):
+        if not request.user.is_active:
+            return JsonResponse({'rounds': [], 'next': None}, status=403)
+        page = golfer_rounds_page(request.user, request.GET.get('after'), self.paginate_by)
+        rounds = [{
+            'id': round.pk,
+            'url': reverse('round_detail', kwargs={'pk': round.pk}),
+            'name': round.name,
+            'course': round.course.name if round.course else None,
+            'created_on': round.created_on,
+            'total_strokes': round.total_strokes,
+            'holes_played': round.holes_played,
+            'to_par': round.to_par,
+        } for round in page]
+        return JsonResponse({'rounds': rounds, 'next': page.next_cursor})
+
+# All of the logged in golfer's rounds as a CSV or NDJSON download, streamed as the rows are read (see exports.py)
+class RoundExport(View):
+    def get(self, request, *args, **kwargs):
+        if not request.user.is_active:
+            return JsonResponse({'error': 'Login to export your rounds'}, status=403)
+        format = request.GET.get('format', 'csv')
+        if format not in EXPORT_FORMATS:
+            return JsonResponse({'error': 'format must be one of %s' % ', '.join(sorted(EXPORT_FORMATS))}, status=400)
+        lines, content_type, extension = EXPORT_FORMATS[format]
+        response = StreamingHttpResponse(lines(export_rows(Round.objects.filter(created_by=request.user))), content_type=content_type)
+        response['Content-Disposition'] = 'attachment; filename="rounds-%s-%s.%s"' % (request.user.pk, date.today().isoformat(), extension)
+        return response
+
+# One page of a golfer's rounds, newest first, with the course name joined in
+def golfer_rounds_page(user, cursor, per_page):
+    rounds = (Round.objects.filter(created_by=user)
+        .select_related('course')
+        .only('name', 'created_on', 'total_strokes', 'holes_played', 'to_par', 'course__name'))
+    return paginate_keyset(rounds, ['-created_on', '-id'], cursor, per_page)
+
+# The logged in golfer's best, worst, average and median score at each course they have completed a round at.
+# Read from the stored statistics, one row per course
+class GolferStats(TemplateView):
+    template_name = 'golfapp/golfer_stats.html'
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        if self.request.user.is_active:
+            # Sorted here, the database would need a temporary sort to order by a column of the joined course
+            course_stats = GolferCourseStats.objects.filter(golfer=self.request.user).select_related('course')
+            context['course_stats'] = sorted(course_stats, key=lambda stats: (stats.course.name, stats.course.pk))
+            context['handicap'] = HandicapIndex.objects.filter(golfer=self.request.user).first()
+        return context
+
 # Create a new GolferUser
 class SignUpView(CreateView):
     form_class = GolferUserCreationForm
@@ -30,9 +129,52 @@ class SignUpView(CreateView):
     template_name = 'signup.html'
 
 # Display a list of the courses in the database
+# Courses are paged by a cursor on (name, id). Searches use the course search index and are paged by page number
 class CourseList(ListView):
     model = Course
     context_object_name = 'course_list'
+    template_name = 'golfapp/course_list.html'
+    per_page = 25
+
+    def get_queryset(self):
+        self.query = self.request.GET.get('q', '').strip()
+        self.page = None
+        if self.query:
+            try:
+                self.page_number = max(int(self.request.GET.get('page', 1)), 1)
+            except ValueError:
+                self.page_number = 1
+            results = search_courses(self.query, limit=self.per_page + 1, offset=(self.page_number - 1) * self.per_page)
+            self.has_next = len(results) > self.per_page
+            return results[:self.per_page]
+        self.page = paginate_keyset(Course.objects.only('name', 'city', 'state'), ['name', 'id'], self.request.GET.get('after'), self.per_page)
+        self.has_next = self.page.has_next
+        return self.page.object_list
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['query'] = self.query
+        context['page'] = self.page
+        context['has_next'] = self.has_next
+        if self.query:
+            context['page_number'] = self.page_number
+        return context
+
+# Typeahead for picking a course. Returns the best matches for the typed text along with each course's tee colors
+class CourseAutocomplete(View):
+    limit = 10
+
+    def get(self, request, *args, **kwargs):
+        courses = search_courses(request.GET.get('q', ''), limit=self.limit)
+        prefetch_related_objects(courses, 'tee_colors')
+        results = [{
+            'id': course.pk,
+            'name': course.name,
+            'city': course.city,
+            'state': course.state,
+            'tee_colors': [{'id': color.pk, 'color': color.color} for color in course.tee_colors.all()],
+        } for course in courses]
+        return JsonResponse({'results': results})
 
 # Course Model C.R.U.D.
 class CourseCreate(CreateView):
@@ -41,16 +183,53 @@ class CourseCreate(CreateView):
     success_url = reverse_lazy('course_list')
 
 # The course page will display information about the holes and tees of a course. 
-class CourseDetail(DetailView):
+class CourseDetail(ConditionalPageMixin, DetailView):
     model = Course
     context_object_name = 'course'
 
-    # Get the holes associated with the course and the tees associated with the holes
+    # The scorecard holds the course's holes with the tee of each color and the hole statistics already matched to its hole.
+    # Pictures are loaded separately from CoursePictureList so the page costs the same however many pictures a course has.
+    # The rendered scorecard is cached (see scorecards.py) so it is only built when the template misses the cache.
+    # The links to add tees and delete holes depend on who is signed in, they are listed apart from the cached card
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        context['holes'] = Hole.objects.filter(course_id=self.object.pk).order_by('number')
-        context['tees'] = Tee.objects.select_related('hole')
-        context['pictures'] = CoursePicture.objects.filter(course_id=self.object.pk).order_by('created_on')
+        context['scorecard'] = SimpleLazyObject(lambda: build_course_scorecard(self.object))
+        context['hole_actions'] = Hole.objects.filter(course_id=self.object.pk).order_by('number').values_list('pk', 'number')
+        return context
+
+# A course's pictures, newest first, paged with a cursor on (created_on, id).
+# The course page loads pages of the gallery fragment as it scrolls, without javascript the pictures get a page of their own
+class CoursePictureList(TemplateView):
+    paginate_by = 12
+
+    def get_template_names(self):
+        if self.request.is_ajax():
+            return ['golfapp/coursepicture_gallery.html']
+        return ['golfapp/coursepicture_list.html']
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['course'] = get_object_or_404(Course, pk=self.kwargs['pk'])
+        pictures = CoursePicture.objects.filter(course_id=context['course'].pk)
+        context['page'] = paginate_keyset(pictures, ['-created_on', '-id'], self.request.GET.get('after'), self.paginate_by)
+        context['pictures'] = context['page'].object_list
+        return context
+
+# The best rounds at a course, over all tees or from one color of tees, all time or over the last 30 days.
+# The board is kept up to date as rounds are completed, so it is read in ranking order straight from the leaderboard index
+class CourseLeaderboard(TemplateView):
+    template_name = 'golfapp/course_leaderboard.html'
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        course = get_object_or_404(Course, pk=self.kwargs['pk'])
+        colors = sorted(course.tee_colors.all(), key=lambda color: color.pk)
+        tee_color = next((color for color in colors if str(color.pk) == self.request.GET.get('tee')), None)
+        window = self.request.GET.get('window', 'ALL')
+        if window not in WINDOWS:
+            window = 'ALL'
+        context.update(course=course, colors=colors, tee_color=tee_color, window=window, windows=LeaderboardEntry.WINDOW_CHOICES,
+            entries=leaderboard(course.pk, tee_color.pk if tee_color else None, window))
         return context
 
 class CourseUpdate(UpdateView):
@@ -100,10 +279,13 @@ class CoursePictureCreate(CreateView):
         initial['course'] = self.kwargs['course_pk']
         return initial
 
+    # The resized copies are made in the background once the picture is saved
     def form_valid(self, form):
         obj = form.save(commit=False)
         obj.created_by = self.request.user
-        return super(CoursePictureCreate, self).form_valid(form)
+        response = super(CoursePictureCreate, self).form_valid(form)
+        schedule_variants(self.object.pk)
+        return response
 
     # Returns the user to the course this hole was created for
     def get_success_url(self, **kwargs):
@@ -207,6 +389,125 @@ class TeeUpdate(UpdateView):
         course_id = self.kwargs['course_pk']
         return reverse_lazy('course_detail', kwargs= {'pk': course_id})
 
+# Edit every hole and tee of a course on one page. The whole hole x tee color grid is validated up front
+# and written with bulk inserts and updates in a single transaction
+class CourseLayoutUpdate(FormView):
+    template_name = 'golfapp/course_layout_form.html'
+    form_class = HoleLayoutFormSet
+
+    def dispatch(self, request, *args, **kwargs):
+        self.course = get_object_or_404(Course, pk=self.kwargs['pk'])
+        self.scorecard = build_course_scorecard(self.course, with_stats=False)
+        # A course can be linked to more than one TeeColor of the same color, the grid only needs one column for each
+        self.colors = []
+        for color in self.scorecard.colors:
+            if color.color and color.color not in self.colors:
+                self.colors.append(color.color)
+        return super().dispatch(request, *args, **kwargs)
+
+    def get_form_kwargs(self):
+        kwargs = super().get_form_kwargs()
+        kwargs['prefix'] = 'holes'
+        kwargs['holes'] = [row.hole for row in self.scorecard.rows]
+        kwargs['form_kwargs'] = {'colors': self.colors}
+        return kwargs
+
+    def get_initial(self):
+        initial = []
+        for row in self.scorecard.rows:
+            hole = row.hole
+            values = {'hole_id': hole.pk, 'number': hole.number, 'name': hole.name, 'mens_par': hole.mens_par, 'womens_par': hole.womens_par}
+            for color, tee, stats in row.cells:
+                if tee and 'yards_' + color.color not in values:
+                    values['yards_' + color.color] = tee.yards
+            initial.append(values)
+        return initial
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['course'] = self.course
+        context['formset'] = context['form']
+        return context
+
+    def form_valid(self, formset):
+        try:
+            with transaction.atomic():
+                holes = {hole.pk: hole for hole in Hole.objects.select_for_update().filter(course_id=self.course.pk)}
+                tees = {(tee.hole_id, tee.color): tee for tee in Tee.objects.filter(hole__course_id=self.course.pk)}
+                layout = []
+                moved, changed, created, par_changed = [], [], [], []
+                for form in formset.layout_forms():
+                    data = form.cleaned_data
+                    hole = holes.get(data.get('hole_id'))
+                    if hole is None:
+                        hole = Hole(course_id=self.course.pk, number=data['number'], name=data['name'],
+                            mens_par=data['mens_par'], womens_par=data['womens_par'])
+                        created.append(hole)
+                    else:
+                        if (hole.number, hole.name) != (data['number'], data['name']):
+                            moved.append(Hole(pk=hole.pk, number=-hole.pk, name=None))
+                        if (hole.mens_par, hole.womens_par) != (data['mens_par'], data['womens_par']):
+                            par_changed.append(hole.pk)
+                        if (hole.number, hole.name, hole.mens_par, hole.womens_par) != (data['number'], data['name'], data['mens_par'], data['womens_par']):
+                            hole.number, hole.name = data['number'], data['name']
+                            hole.mens_par, hole.womens_par = data['mens_par'], data['womens_par']
+                            changed.append(hole)
+                    layout.append((data, hole))
+
+                # Deleting goes through the Hole signals so scores on the holes are taken off their rounds
+                deleted = formset.deleted_hole_ids() & set(holes)
+                if deleted:
+                    Hole.objects.filter(pk__in=deleted).delete()
+                # Holes that change number or name are parked on a number and name no other hole can have first,
+                # so two holes can swap numbers without tripping the unique constraint halfway through
+                now = timezone.now() # bulk_update leaves auto_now fields alone
+                for hole in changed:
+                    hole.updated_at = now
+                Hole.objects.bulk_update(moved, ['number', 'name'])
+                Hole.objects.bulk_update(changed, ['number', 'name', 'mens_par', 'womens_par', 'updated_at'])
+                Hole.objects.bulk_create(created)
+                if created:
+                    # SQLite doesn't return the primary keys from bulk_create so the new holes are read back by number
+                    numbers = dict(Hole.objects.filter(course_id=self.course.pk, number__in=[hole.number for hole in created]).values_list('number', 'pk'))
+                    for hole in created:
+                        hole.pk = numbers[hole.number]
+
+                new_tees, changed_tees, removed_tees = [], [], []
+                for data, hole in layout:
+                    for color in self.colors:
+                        yards = data.get('yards_' + color)
+                        tee = tees.get((hole.pk, color))
+                        if tee is None and yards:
+                            new_tees.append(Tee(hole_id=hole.pk, color=color, yards=yards))
+                        elif tee is not None and not yards:
+                            removed_tees.append(tee.pk)
+                        elif tee is not None and tee.yards != yards:
+                            tee.yards, tee.updated_at = yards, now
+                            changed_tees.append(tee)
+                if removed_tees:
+                    Tee.objects.filter(pk__in=removed_tees).delete()
+                Tee.objects.bulk_update(changed_tees, ['yards', 'updated_at'])
+                Tee.objects.bulk_create(new_tees)
+
+                # Bulk writes don't send the Hole and Tee signals, the course's cached scorecard, the rounds played on holes
+                # whose par changed and, when holes were added, every round of the course (they may no longer be complete) are refreshed here
+                expire_course_scorecards([self.course.pk])
+                rounds = set(Score.objects.filter(hole_id__in=par_changed).values_list('round_id', flat=True)) if par_changed else set()
+                if created:
+                    rounds.update(Round.objects.filter(course_id=self.course.pk).values_list('pk', flat=True))
+                if rounds:
+                    rebuild_round_totals(rounds)
+                if par_changed:
+                    rebuild_hole_stats(par_changed)
+        except IntegrityError:
+            # Another request changed the course's holes while this layout was being saved
+            formset._non_form_errors = formset.error_class(['The course layout was changed while you were editing it. Please try again.'])
+            return self.form_invalid(formset)
+        return super().form_valid(formset)
+
+    def get_success_url(self, **kwargs):
+        return reverse_lazy('course_detail', kwargs={'pk': self.course.pk})
+
 # I dont believe this view is ever used... 
 #  When a user deletes a hole its tees are deleted, if a user needs to change a tees data they would update an existing one.
 # Theres no real reason a user would want to manually delete a tee
@@ -234,39 +535,35 @@ class TeeDelete(DeleteView):
 # Planned to change the success url to the newly created round instead of the round list
 class RoundCreate(CreateView):
     model = Round
-    fields = ['name', 'course', 'tee_color']
+    form_class = RoundForm
     success_url = reverse_lazy('home')
     def form_valid(self, form):
         obj = form.save(commit=False)
         obj.created_by = self.request.user
         return super(RoundCreate, self).form_valid(form)
 
-class RoundDetail(DetailView):
+class RoundDetail(ConditionalPageMixin, DetailView):
     model = Round
     context_object_name = 'round'
 
-    # Score calcutlation is done by comparing the total_par to the rounds total_score
-    # Planned to change this to include womens par
-    # Planned to change this to automaticaly show only the score difference relevent to the user's gender
+    # The round page shows the course's holes and tees as well as the round
+    last_modified_fields = ['updated_at', 'course__updated_at']
+
+    # The round is loaded with its course, tee color and golfer so the page needs no lazy lookups
+    def get_queryset(self):
+        return Round.objects.select_related('course', 'tee_color', 'created_by')
+
+    # Score calculation is done by comparing the par of the holes played to the round's total strokes
+    # The over/under par uses the mens or womens par depending on the golfer's gender
+    # The scorecard is only built when its cached fragment is missing
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        context['holes'] = Hole.objects.filter(course_id=self.object.course.pk).order_by('number')
-        context['tees'] = Tee.objects.filter(color=self.object.tee_color)
-        context['scores'] = Score.objects.filter(round_id=self.object.pk)
-        context['total_score'] = Score.objects.filter(round_id=self.object.pk).aggregate(total_score=Sum('strokes'))
-        context['total_mens_par'] = Hole.objects.filter(course_id=self.object.course.pk).aggregate(total_mens_par=Sum('mens_par'))
-        context['total_womens_par'] = Hole.objects.filter(course_id=self.object.course.pk).aggregate(total_womens_par=Sum('womens_par'))
-        ##context['total_par'] = Hole.objects.filter(course_id=self.object.course.pk).aggregate(total_mens_par=Sum('mens_par'))
-        if (context['total_score'].get('total_score') and (context['total_mens_par'].get('total_mens_par') or context['total_womens_par'].get('total_womens_par'))):
-            if (self.object.created_by.gender != 'MALE'):
-                context['player_par'] = context['total_score'].get('total_score') - context['total_womens_par'].get('total_womens_par')
-            else:
-                context['player_par'] = context['total_score'].get('total_score') - context['total_mens_par'].get('total_mens_par')
+        context['scorecard'] = SimpleLazyObject(lambda: build_round_scorecard(self.object))
         return context
 
 class RoundUpdate(UpdateView):
     model = Round
-    fields = ['name', 'course', 'tee_color']
+    form_class = RoundForm
 
     def get_success_url(self, **kwargs):
         round_id = self.kwargs['pk']
@@ -291,4 +588,69 @@ class ScoreCreate(CreateView):
         round_id = self.kwargs['round_pk']
         return reverse_lazy('round_detail', kwargs= {'pk': round_id})
 
-# Need to add update view for score model
\ No newline at end of file
+# Need to add update view for score model
+
+# Enter the whole scorecard of a round at once. Every hole is validated in one formset and the scores are written in one transaction
+class RoundScoresUpdate(FormView):
+    template_name = 'golfapp/round_scores_form.html'
+    form_class = ScoreEntryFormSet
+
+    def dispatch(self, request, *args, **kwargs):
+        self.round = get_object_or_404(Round.objects.select_related('course', 'tee_color', 'created_by'), pk=self.kwargs['pk'])
+        self.scorecard = build_round_scorecard(self.round)
+        return super().dispatch(request, *args, **kwargs)
+
+    def get_form_kwargs(self):
+        kwargs = super().get_form_kwargs()
+        kwargs['prefix'] = 'scores'
+        kwargs['hole_ids'] = [row.hole_pk for row in self.scorecard.rows]
+        return kwargs
+
+    # The hole number and par are only used to label the form
+    def get_initial(self):
+        return [{'hole': row.hole_pk, 'strokes': row.strokes, 'number': row.number, 'mens_par': row.mens_par, 'womens_par': row.womens_par}
+            for row in self.scorecard.rows]
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['round'] = self.round
+        context['formset'] = context['form']
+        return context
+
+    # New scores are bulk inserted and changed scores bulk updated.
+    # Bulk writes don't send signals so their changes are applied to the round totals and hole statistics here, deletes go through the Score signals
+    def form_valid(self, formset):
+        try:
+            with transaction.atomic():
+                existing = {score.hole_id: score for score in Score.objects.select_for_update().filter(round_id=self.round.pk)}
+                created, updated, deleted, changes = [], [], [], []
+                for form in formset.forms:
+                    hole_id = form.cleaned_data.get('hole')
+                    strokes = form.cleaned_data.get('strokes')
+                    score = existing.get(hole_id)
+                    if form.cleaned_data.get('DELETE') or strokes is None:
+                        if score:
+                            deleted.append(score.pk)
+                    elif score is None:
+                        created.append(Score(round_id=self.round.pk, hole_id=hole_id, strokes=strokes))
+                        changes.append(ScoreChange(self.round.pk, hole_id, strokes, 1))
+                    elif score.strokes != strokes:
+                        changes.append(ScoreChange(self.round.pk, hole_id, score.strokes, -1))
+                        changes.append(ScoreChange(self.round.pk, hole_id, strokes, 1))
+                        score.strokes, score.updated_at = strokes, timezone.now()
+                        updated.append(score)
+                if deleted:
+                    Score.objects.filter(pk__in=deleted).delete()
+                Score.objects.bulk_create(created)
+                Score.objects.bulk_update(updated, ['strokes', 'updated_at'])
+                apply_score_changes(changes)
+                record_hole_scores(changes)
+                expire_round_scorecards([self.round.pk])
+        except IntegrityError:
+            # Another request scored one of these holes while this card was being saved
+            formset._non_form_errors = formset.error_class(['The scorecard was changed while you were editing it. Please try again.'])
+            return self.form_invalid(formset)
+        return super().form_valid(formset)
+
+    def get_success_url(self, **kwargs):
+        return reverse_lazy('round_detail', kwargs={'pk': self.round.pk})
@@ -0,0 +1,151 @@
+$(function() {
+    // Whole card score entry. Each hole gets a link to clear its score, the formset's max forms keeps extra holes from being added
+    $('.score-entry').formset({
+        prefix: 'scores',
+        deleteText: 'clear',
+        addText: ''
+    });
+
+    // Course layout editor. Holes can be added to the end of the grid or removed from it
+    $('.hole-layout').formset({
+        prefix: 'holes',
+        deleteText: 'remove hole',
+        addText: 'add hole'
+    });
+});
+
+$(function() {
+    // Home page rounds. Older rounds are loaded from the round feed when the "Older rounds" link scrolls into view
+    var roundList = $('.round-list'),
+        moreRounds = $('.more-rounds'),
+        loading = false;
+    if (!roundList.length || !moreRounds.length) return;
+
+    var roundLink = function(round) {
+        var container = $('<div class="rounds-container"></div>'),
+            date = new Date(round.created_on);
+        container.append($('<h3></h3>').text(round.course || ''));
+        container.append($('<h5></h5>').text(date.toLocaleDateString('en-US', {month: 'long', day: '2-digit', year: 'numeric'})));
+        if (round.holes_played) {
+            var toPar = round.to_par == 0 ? 'E' : (round.to_par > 0 ? '+' : '') + round.to_par;
+            container.append($('<h5></h5>').text(round.total_strokes + ' through ' + round.holes_played + ' (' + toPar + ')'));
+        }
+        return $('<a class="round-link"></a>').attr('href', round.url).append(container);
+    };
+
+    var loadRounds = function() {
+        if (loading) return false;
+        loading = true;
+        $.getJSON(roundList.data('feed'), {after: moreRounds.data('after')}, function(data) {
+            $.each(data.rounds, function(i, round) {
+                roundList.append(roundLink(round));
+            });
+            if (data.next) {
+                moreRounds.data('after', data.next).attr('href', '?after=' + data.next);
+            } else {
+                moreRounds.parent().remove();
+                moreRounds = $();
+            }
+        }).always(function() {
+            loading = false;
+        });
+        return false;
+    };
+
+    moreRounds.click(loadRounds);
+    if ('IntersectionObserver' in window) {
+        new IntersectionObserver(function(entries) {
+            if (entries[0].isIntersecting && moreRounds.length) loadRounds();
+        }).observe(moreRounds.parent().get(0));
+    }
+});
+
+$(function() {
+    // Round form course typeahead. Picking a course fills the hidden course field and lists only that course's tee colors
+    $('.course-autocomplete').each(function() {
+        var input = $(this),
+            course = $('[name="' + input.data('course') + '"]'),
+            teeColor = $('[name="' + input.data('tee-color') + '"]'),
+            results = $('<ul class="autocomplete-results"></ul>').insertAfter(input),
+            timer = null,
+            request = null;
+
+        var choose = function(result) {
+            input.val(result.name);
+            course.val(result.id);
+            teeColor.empty().append($('<option value="">---------</option>'));
+            $.each(result.tee_colors, function(i, color) {
+                teeColor.append($('<option></option>').val(color.id).text(color.color));
+            });
+            results.empty();
+        };
+
+        input.on('input', function() {
+            course.val('');
+            clearTimeout(timer);
+            timer = setTimeout(function() {
+                if (request) request.abort();
+                if (!$.trim(input.val())) return results.empty();
+                request = $.getJSON(input.data('url'), {q: input.val()}, function(data) {
+                    results.empty();
+                    $.each(data.results, function(i, result) {
+                        $('<li></li>').text(result.name + ' - ' + result.city + ', ' + result.state)
+                            .click(function() { choose(result); })
+                            .appendTo(results);
+                    });
+                });
+            }, 150);
+        });
+    });
+});
+
+$(function() {
+    // Course page pictures. The first page of the gallery is fetched once the page has loaded,
+    // later pages when the link at the end of the gallery scrolls into view
+    var gallery = $('.picture-gallery'),
+        loading = false,
+        observer = null;
+    if (!gallery.length) return;
+
+    var loadPictures = function(url) {
+        if (loading) return false;
+        loading = true;
+        $.get(url, function(html) {
+            gallery.find('.more-pictures-container').remove();
+            gallery.append(html);
+            var more = gallery.find('.more-pictures-container');
+            if (observer && more.length) observer.observe(more.get(0));
+        }).always(function() {
+            loading = false;
+        });
+        return false;
+    };
+
+    gallery.on('click', '.more-pictures', function() {
+        return loadPictures($(this).attr('href'));
+    });
+    if ('IntersectionObserver' in window) {
+        observer = new IntersectionObserver(function(entries) {
+            $.each(entries, function(i, entry) {
+                if (entry.isIntersecting) {
+                    observer.unobserve(entry.target);
+                    loadPictures($(entry.target).find('.more-pictures').attr('href'));
+                }
+            });
+        }, {root: gallery.get(0)});
+    }
+    loadPictures(gallery.data('gallery'));
+});
+
+$(function() {
+    // Course page hole links. The scorecard is cached the same for everyone, so the links for the signed in golfer are listed
+    // after it and moved into the columns of their holes here
+    var actions = $('.hole-action-list');
+    if (!actions.length) return;
+
+    actions.find('[data-hole]').each(function() {
+        $('.hole-actions[data-hole="' + $(this).data('hole') + '"]').append($(this).children('a'));
+    });
+    $('.hole-actions-label').text('Act');
+    actions.remove();
+});